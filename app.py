@@ -1,7 +1,14 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
 from plotly import express as px
-import joblib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
+from consulta import carregar_consulta, linhas, quebra, resumo, versao_consulta
+from pacote import ARQUIVO_PACOTE, ler_pacote
+from predicao import carregar_artefatos, prever_lote, versao_artefatos
 
 COLORS = {
     'number': "#AEC6CF",
@@ -28,16 +35,133 @@ opcao = st.sidebar.radio("Selecione um tópico de análise:", [
     "Visão Geral",
     "Por linhas aéreas",
     "Geográfica",
-    # "Temporal",
+    "Temporal",
+    "Consulta",
     "Classificação de Atraso"
 ])
 
+PATH_PACOTE = os.path.join('tables', ARQUIVO_PACOTE)
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_tabelas(versao):
+    return ler_pacote(PATH_PACOTE)
+
+
+def carregar_tabelas():
+    '''Todas as tabelas do dashboard, lidas uma vez do pacote gerado por gerar_tabelas.py
+    e compartilhadas entre sessões sem cópia. A chave é o mtime/tamanho do pacote,
+    então gerar as tabelas de novo recarrega tudo automaticamente.'''
+    if not os.path.exists(PATH_PACOTE):
+        return {}
+    stat = os.stat(PATH_PACOTE)
+    return _carregar_tabelas((stat.st_mtime_ns, stat.st_size))
+
+
 @st.cache_data
-def carregar_dados(path):
+def _ler_csv(path, versao):
     try:
         return pd.read_csv(path)
     except Exception:
-        return st.error("Erro ao carregar dados.")
+        return None
+
+
+def carregar_dados(path):
+    '''Tabela de tables/ vinda do pacote; só lê o CSV se ela não estiver empacotada.
+    Retorna None se a tabela não existe ou não pôde ser lida (ver `aviso_sem_tabela`).
+    A tabela é compartilhada: só é lida, nunca modificada.'''
+    tabela = carregar_tabelas().get(os.path.relpath(path, 'tables').replace(os.sep, '/'))
+    if tabela is not None:
+        return tabela
+    if not os.path.exists(path):
+        return None
+    # o mtime na chave faz um CSV gerado de novo ser relido
+    return _ler_csv(path, os.path.getmtime(path))
+
+
+def aviso_sem_tabela(*arquivos):
+    '''Aviso no lugar de um gráfico cujas tabelas ainda não foram geradas'''
+    st.info(f"Tabela não encontrada ({', '.join(arquivos)}). Gere as tabelas com "
+            "`python gerar_tabelas.py` (na pasta scripts/).")
+
+PATH_DESTINOS = 'tables/destinos_por_comp.parquet'
+
+
+@st.cache_data
+def _ler_destinos(comp, versao):
+    return pd.read_parquet(PATH_DESTINOS, columns=['DestCityName', 'count'],
+                           filters=[('Airline', '==', comp)])
+
+
+def carregar_destinos(comp):
+    '''Top 10 destinos de uma companhia, ou None se não foram gerados. Se existir o
+    arquivo único indexado, lê apenas o row group da companhia; senão, o CSV
+    individual em tables/comps/.'''
+    if os.path.exists(PATH_DESTINOS):
+        return _ler_destinos(comp, os.path.getmtime(PATH_DESTINOS))
+    nome = comp.split(' ')[0]
+    return carregar_dados(f'tables/comps/{nome}_destinos.csv')
+
+
+# Estatística do atraso nos gráficos: a média vem dos CSVs originais e os quantis
+# dos CSVs quantis_por_*.csv (sketch com erro relativo de até 1%)
+ESTATISTICAS = {
+    'Média': None,
+    'Mediana (p50)': 'P50',
+    'p90': 'P90',
+    'p99': 'P99',
+}
+
+
+def com_quantil(df, chave, arquivo_quantis, quantil):
+    '''Acrescenta a `df` a coluna do quantil de atraso, casando por `chave`; None se
+    a tabela de quantis não existe'''
+    quantis = carregar_dados(f'tables/{arquivo_quantis}')
+    if quantis is None:
+        return None
+    return df.merge(quantis[[chave, quantil]], on=chave, how='left')
+
+
+PATH_CUBO = 'tables/cubo_temporal.parquet'
+
+
+@st.cache_resource
+def _carregar_cubo(versao):
+    return pd.read_parquet(PATH_CUBO)
+
+
+def carregar_cubo():
+    '''Cubo pré-agregado da página "Temporal" (gerado por gerar_tabelas.py), ou None se
+    ainda não foi gerado. Compartilhado entre sessões sem cópia; só é lido, nunca
+    modificado. A chave é o mtime/tamanho, então gerar de novo recarrega o cubo.'''
+    if not os.path.exists(PATH_CUBO):
+        return None
+    stat = os.stat(PATH_CUBO)
+    return _carregar_cubo((stat.st_mtime_ns, stat.st_size))
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_modelo(versao):
+    return carregar_artefatos()
+
+
+@st.cache_resource(max_entries=1)
+def _carregar_consulta(versao):
+    return carregar_consulta()
+
+
+def carregar_consulta_voos():
+    '''Camada de consulta ad hoc (gerada por scripts/consulta.py), mapeada em memória
+    e compartilhada entre sessões; recarregada quando é gerada de novo'''
+    versao = versao_consulta()
+    return None if versao is None else _carregar_consulta(versao)
+
+
+def carregar_modelo():
+    '''Artefatos do classificador, em cache por processo. A chave inclui os mtimes
+    dos arquivos, então re-treinar o modelo invalida o cache automaticamente.'''
+    return _carregar_modelo(versao_artefatos())
+
 
 def format_number(number):
     if int(number) != number:
@@ -61,6 +185,9 @@ def _chart_bar(fig):
     )
     st.plotly_chart(fig)
 
+# Lê o pacote de tabelas já na abertura, não na primeira visita a cada página
+carregar_tabelas()
+
 # --- Exibir visualizações conforme opção escolhida ---
 match opcao:
     case "Visão Geral":
@@ -80,13 +207,17 @@ match opcao:
 
         st.text('10 voos aleatórios:')
 
+        # a amostra já vem em ordem aleatória (pela chave de amostragem)
         df = carregar_dados('tables/100samples.csv')
-        st.dataframe(df.sample(10))
+        st.dataframe(df.head(10))
         st.write(df.describe())
 
     case "Por linhas aéreas":
         st.sidebar.subheader('Selecione métricas de análise')
 
+        estatistica = st.sidebar.selectbox('Estatística do atraso:', options=list(ESTATISTICAS))
+        quantil = ESTATISTICAS[estatistica]
+
         metricas = {
             'num': st.sidebar.checkbox('Número de voos'),
             'dist': st.sidebar.checkbox('Distância média'),
@@ -114,7 +245,7 @@ match opcao:
                 x='Distance',
                 orientation='h', color_discrete_sequence=[COLORS['dist']],
             ))
-        if metricas['delay']:
+        if metricas['delay'] and quantil is None:
             st.subheader('Atraso médio de chegada por companhia:')
 
             _chart_hbar(px.bar(
@@ -123,6 +254,19 @@ match opcao:
                 x='ArrDelay',
                 orientation='h', color_discrete_sequence=[COLORS['delay']],
             ))
+        elif metricas['delay']:
+            st.subheader(f'Atraso de chegada por companhia ({estatistica}):')
+
+            quantis_por_comp = carregar_dados('tables/quantis_por_comp.csv')
+            if quantis_por_comp is None:
+                aviso_sem_tabela('quantis_por_comp.csv')
+            else:
+                _chart_hbar(px.bar(
+                    data_frame=quantis_por_comp.sort_values(by=quantil),
+                    labels={'Airline': 'Linha aérea', quantil: f'Atraso {estatistica} [min]'},
+                    x=quantil, y='Airline',
+                    orientation='h', color_discrete_sequence=[COLORS['delay']],
+                ))
         if metricas['cancel']:
             st.subheader('Companhias aéreas que mais cancelam:')
 
@@ -143,49 +287,65 @@ match opcao:
                 orientation='h', color_discrete_sequence=[COLORS['cancel']],
             ))
         if metricas['voos_vs_delay']:
-            st.subheader('Atraso médio com relação ao número de voos (Top 10 companhias)')
+            st.subheader(f'Atraso ({estatistica}) com relação ao número de voos (Top 10 companhias)')
 
             df_voos_delay = carregar_dados('tables/voos_delay.csv')
 
             df_voos_delay_top10 = df_voos_delay.nlargest(10, 'NumVoos')
-
-            fig = px.scatter(
-                df_voos_delay_top10,
-                x='NumVoos',
-                y='AtrasoMedio',
-                text='Airline',
-                size='NumVoos',
-                color_discrete_sequence=[COLORS['delay']],
-                labels={
-                    'NumVoos': 'Número de voos',
-                    'AtrasoMedio': 'Atraso médio (min)',
-                    'Airline': 'Companhia'
-                },
-                title='Top 10 companhias: Nº de voos vs Atraso médio'
-            )
-            fig.update_traces(textposition='top center')
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
+            if quantil is not None:
+                df_voos_delay_top10 = com_quantil(df_voos_delay_top10, 'Airline', 'quantis_por_comp.csv', quantil)
+
+            if df_voos_delay_top10 is None:
+                aviso_sem_tabela('quantis_por_comp.csv')
+            else:
+                fig = px.scatter(
+                    df_voos_delay_top10,
+                    x='NumVoos',
+                    y=quantil or 'AtrasoMedio',
+                    text='Airline',
+                    size='NumVoos',
+                    color_discrete_sequence=[COLORS['delay']],
+                    labels={
+                        'NumVoos': 'Número de voos',
+                        'AtrasoMedio': 'Atraso médio (min)',
+                        quantil: f'Atraso {estatistica} (min)',
+                        'Airline': 'Companhia'
+                    },
+                    title=f'Top 10 companhias: Nº de voos vs Atraso ({estatistica})'
+                )
+                fig.update_traces(textposition='top center')
+                fig.update_layout(height=500)
+                st.plotly_chart(fig, use_container_width=True)
 
 
     case "Geográfica":
         st.sidebar.subheader('Selecione métricas de análise')
 
+        estatistica = st.sidebar.selectbox('Estatística do atraso:', options=list(ESTATISTICAS))
+        quantil = ESTATISTICAS[estatistica]
+
         metricas = {
             'faixas': st.sidebar.checkbox('Relação atraso e distância'),
             'cidades-companhias': st.sidebar.checkbox('Principais cidades por companhia'),
             'voos_vs_delay_city': st.sidebar.checkbox('Relação entre atraso e número de voos'),
             'city-delay': st.sidebar.checkbox('Principais cidades por atrasos'),
+            'rotas': st.sidebar.checkbox('Principais rotas'),
         }
 
         if metricas['faixas']:
             st.subheader('O atraso dos voos depende da distância?')
 
-            _chart_bar(px.bar(
-                data_frame=carregar_dados('tables/atrasos_por_faixa.csv'),
-                labels={'FaixaDistancia': 'Faixa de distância [milhas]', 'ArrDelay': 'Atraso de chegada [min]'},
-                x='FaixaDistancia', y='ArrDelay', color_discrete_sequence=[COLORS['delay']],
-            ))
+            arquivo = 'atrasos_por_faixa.csv' if quantil is None else 'quantis_por_faixa.csv'
+            atrasos_por_faixa = carregar_dados(f'tables/{arquivo}')
+            if atrasos_por_faixa is None:
+                aviso_sem_tabela(arquivo)
+            else:
+                _chart_bar(px.bar(
+                    data_frame=atrasos_por_faixa,
+                    labels={'FaixaDistancia': 'Faixa de distância [milhas]', 'ArrDelay': 'Atraso de chegada [min]',
+                            quantil: f'Atraso de chegada ({estatistica}) [min]'},
+                    x='FaixaDistancia', y=quantil or 'ArrDelay', color_discrete_sequence=[COLORS['delay']],
+                ))
 
 
         if metricas['cidades-companhias']:
@@ -194,12 +354,24 @@ match opcao:
             voos_por_companhia = carregar_dados('tables/voos_por_companhia.csv')
             comp = st.selectbox('Companhia:', options=sorted(voos_por_companhia['Airline']))
 
-            _chart_hbar(px.bar(
-                data_frame=carregar_dados(f'tables/comps/{comp.split(' ')[0]}_destinos.csv'),
-                labels={'DestCityName': 'Cidade', 'count': f'Voos da "{comp}" com destino a esta cidade'},
-                x='count',
-                orientation='h', color_discrete_sequence=[COLORS['number']],
-            ))
+            destinos = carregar_destinos(comp)
+            # tabelas antigas de comps/ só têm a coluna count (os 10 destinos menos movimentados)
+            formato_antigo = destinos is not None and 'DestCityName' not in destinos
+            if destinos is None:
+                aviso_sem_tabela(f"comps/{comp.split(' ')[0]}_destinos.csv")
+            elif formato_antigo:
+                st.caption('Tabela no formato antigo: os 10 destinos com menos voos, sem o nome da cidade. '
+                           'Rode `scripts/gerar_tabelas.py` para o ranking dos 10 destinos com mais voos.')
+            else:
+                st.caption(f'Os 10 destinos com mais voos da "{comp}".')
+
+            if destinos is not None:
+                _chart_hbar(px.bar(
+                    data_frame=destinos,
+                    labels={'DestCityName': 'Cidade', 'count': f'Voos da "{comp}" com destino a esta cidade'},
+                    x='count', y=None if formato_antigo else 'DestCityName',
+                    orientation='h', color_discrete_sequence=[COLORS['number']],
+                ))
 
         if metricas['voos_vs_delay_city']:
             st.subheader('Relação entre número de voos e atraso médio por cidade de destino')
@@ -207,131 +379,282 @@ match opcao:
             df_voos_delay_cidade = carregar_dados('tables/atrasos_por_cidade.csv')
 
             df_voos_delay_cidade_top = df_voos_delay_cidade.nlargest(15, 'NumVoos')
-
-            _chart_hbar(px.scatter(
-                df_voos_delay_cidade_top,
-                x='NumVoos',
-                y='AtrasoMedio',
-                size='NumVoos',
-                text='DestCityName',
-                color_discrete_sequence=[COLORS['delay']],
-                labels={
-                    'NumVoos': 'Número de voos',
-                    'AtrasoMedio': 'Atraso médio [min]',
-                    'DestCityName': 'Cidade de destino'
-                },
-                title='Relação entre número de voos e atraso médio por cidade'
-            ))
+            if quantil is not None:
+                df_voos_delay_cidade_top = com_quantil(df_voos_delay_cidade_top, 'DestCityName',
+                                                       'quantis_por_cidade.csv', quantil)
+
+            if df_voos_delay_cidade_top is None:
+                aviso_sem_tabela('quantis_por_cidade.csv')
+            else:
+                _chart_hbar(px.scatter(
+                    df_voos_delay_cidade_top,
+                    x='NumVoos',
+                    y=quantil or 'AtrasoMedio',
+                    size='NumVoos',
+                    text='DestCityName',
+                    color_discrete_sequence=[COLORS['delay']],
+                    labels={
+                        'NumVoos': 'Número de voos',
+                        'AtrasoMedio': 'Atraso médio [min]',
+                        quantil: f'Atraso {estatistica} [min]',
+                        'DestCityName': 'Cidade de destino'
+                    },
+                    title=f'Relação entre número de voos e atraso ({estatistica}) por cidade'
+                ))
 
         if metricas['city-delay']:
-            st.subheader('Top 10 cidades com maiores atrasos médios de chegada')
+            st.subheader(f'Top 10 cidades com maiores atrasos de chegada ({estatistica})')
+
+            arquivo = 'city_delay.csv' if quantil is None else 'quantis_por_cidade.csv'
+            df_city_delay = carregar_dados(f'tables/{arquivo}')
+            coluna = quantil or 'AtrasoMedio'
+
+            if df_city_delay is None:
+                aviso_sem_tabela(arquivo)
+            else:
+                _chart_hbar(px.bar(
+                    data_frame=df_city_delay.nlargest(10, coluna).sort_values(by=coluna),  # menor para cima
+                    x=coluna,
+                    y='DestCityName',
+                    orientation='h',
+                    color_discrete_sequence=[COLORS['delay']],
+                    labels={
+                        'DestCityName': 'Cidade de destino',
+                        'AtrasoMedio': 'Atraso médio [min]',
+                        quantil: f'Atraso {estatistica} [min]'
+                    },
+                    title=f'Top 10 cidades com maiores atrasos ({estatistica})'
+                ))
+
+        if metricas['rotas']:
+            st.subheader('Top 10 rotas (origem → destino)')
+
+            rotas_movimentadas = carregar_dados('tables/rotas_movimentadas.csv')
+            rotas_atrasadas = carregar_dados('tables/rotas_atrasadas.csv')
+            if rotas_movimentadas is None or rotas_atrasadas is None:
+                aviso_sem_tabela('rotas_movimentadas.csv', 'rotas_atrasadas.csv')
+            else:
+                comps = sorted(set(rotas_movimentadas['Airline']) - {'Todas'})
+                comp = st.selectbox('Companhia:', options=['Todas', *comps], key='comp_rotas')
+
+                # ErroMax: voos que podem ter ficado fora da contagem aproximada da rota
+                # (e, portanto, também fora do atraso médio dela)
+                st.caption('Contagens aproximadas (resumo de rotas mais frequentes): o erro máximo de cada '
+                           'rota está no hover. O atraso médio considera só os voos contados.')
+                cols = st.columns(2)
+                with cols[0]:
+                    _chart_hbar(px.bar(
+                        data_frame=rotas_movimentadas[rotas_movimentadas['Airline'] == comp],
+                        x='NumVoos', y='Rota',
+                        orientation='h', color_discrete_sequence=[COLORS['number']],
+                        hover_data=['ErroMax'],
+                        labels={'Rota': 'Rota', 'NumVoos': 'Número de voos', 'ErroMax': 'Erro máximo'},
+                        title='Rotas mais movimentadas'
+                    ))
+                with cols[1]:
+                    _chart_hbar(px.bar(
+                        data_frame=rotas_atrasadas[rotas_atrasadas['Airline'] == comp],
+                        x='AtrasoMedio', y='Rota',
+                        orientation='h', color_discrete_sequence=[COLORS['delay']],
+                        hover_data=['NumVoos', 'ErroMax'],
+                        labels={'Rota': 'Rota', 'AtrasoMedio': 'Atraso médio aproximado [min]',
+                                'NumVoos': 'Número de voos', 'ErroMax': 'Voos fora da média (máx.)'},
+                        title='Rotas com maiores atrasos médios (aprox.)'
+                    ))
+    case 'Temporal':
+        st.subheader('Análise temporal')
+        cols = st.columns(2)
+        with cols[0]:
+            scale = st.select_slider('Escala temporal:', options=['Ano', 'Mês', 'Semana', 'Dia'])
+        with cols[1]:
+            metrica = st.radio('Métrica:', options=['Voos', 'Atrasos', 'Cancelamentos'])
+
+
+        key = {
+            'Ano': 'Month',
+            'Mês': 'DayOfMonth',
+            'Semana': 'DayOfWeek',
+            'Dia': 'HourBlock',
+        }[scale]
+
+        label = {
+            'Ano': 'Mês',
+            'Mês': 'Dia do mês',
+            'Semana': 'Dia da semana',
+            'Dia': 'Bloco de hora',
+        }[scale]
+
+        cubo = carregar_cubo()
+        if cubo is None:
+            st.info('Gere o cubo temporal com `python gerar_tabelas.py` (na pasta scripts/).')
+            st.stop()
+
+        anos = sorted(cubo['Year'].unique())
+        if len(anos) > 1:
+            with st.columns([0.5, 0.5])[0]:
+                ano = st.selectbox('Ano:', options=['Todos', *anos])
+            if ano != 'Todos':
+                cubo = cubo[cubo['Year'] == ano]
+
+        if scale == 'Mês':
+            with st.columns([0.5, 0.5])[0]:
+                month = st.selectbox('Mês do ano:', options=['Todos', *range(1,13)])
+            if month != 'Todos':
+                cubo = cubo[cubo['Month'] == month]
+
+        gb = cubo.groupby(key)[['NumVoos', 'SomaAtraso', 'NumAtraso', 'Cancelados']].sum()
+
+        match metrica:
+            case 'Voos':
+                st.subheader(f'Número total de voos por {label}')
+                _chart_bar(px.bar(
+                    data_frame=gb['NumVoos'].reset_index(name='count'),
+                    labels={key: label, 'count': 'Número de voos'},
+                    x=key, y='count',
+                    color_discrete_sequence=[COLORS['number']]
+                ))
+            case 'Atrasos':
+                st.subheader(f'Atraso de chegada médio por {label}')
+                _chart_bar(px.bar(
+                    data_frame=(gb['SomaAtraso'] / gb['NumAtraso']).reset_index(name='count'),
+                    labels={key: label, 'count': 'Tempo médio de atraso [min]'},
+                    x=key, y='count',
+                    color_discrete_sequence=[COLORS['delay']]
+                ))
+            case 'Cancelamentos':
+                st.subheader(f'Número total de cancelamentos por {label}')
+                _chart_bar(px.bar(
+                    data_frame=gb['Cancelados'].reset_index(name='count'),
+                    labels={key: label, 'count': 'Número de cancelamentos'},
+                    x=key, y='count',
+                    color_discrete_sequence=[COLORS['cancel']]
+                ))
+    case "Consulta":
+        st.subheader('Consulta ad hoc de voos')
+
+        consulta = carregar_consulta_voos()
+        if consulta is None:
+            st.info('Gere a camada de consulta com `python scripts/consulta.py`.')
+            st.stop()
+
+        categorias = consulta['categorias']
+        dias = ['', 'Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+        st.sidebar.subheader('Filtros')
+        filtros = {
+            'Airline': st.sidebar.multiselect('Companhias:', categorias['Airline']),
+            'Month': st.sidebar.multiselect('Meses:', categorias['Month'][1:]),
+            'DayOfWeek': st.sidebar.multiselect('Dias da semana:', categorias['DayOfWeek'][1:],
+                                                format_func=lambda dia: dias[dia]),
+            'OriginCityName': st.sidebar.multiselect('Cidades de origem:', categorias['OriginCityName']),
+            'DestCityName': st.sidebar.multiselect('Cidades de destino:', categorias['DestCityName']),
+        }
+
+        # Os índices resolvem os filtros; só as linhas selecionadas são lidas
+        selecao = linhas(consulta, filtros)
+        metricas = resumo(consulta, selecao)
 
-            df_city_delay = carregar_dados('tables/city_delay.csv')
+        if metricas['NumVoos'] == 0:
+            st.warning('Nenhum voo com esses filtros.')
+            st.stop()
 
+        cols = st.columns(5)
+        with cols[0]:
+            st.metric('Voos', format_number(metricas['NumVoos']), border=True)
+        with cols[1]:
+            st.metric('Cancelados', format_number(metricas['Cancelados']), border=True)
+        with cols[2]:
+            st.metric('Atraso médio', f"{metricas['AtrasoMedio']:.1f} min", border=True)
+        with cols[3]:
+            st.metric('Mediana do atraso', f"{metricas['P50']:.0f} min", border=True)
+        with cols[4]:
+            st.metric('p90 do atraso', f"{metricas['P90']:.0f} min", border=True)
+
+        nomes = {
+            'Airline': 'Linha aérea',
+            'Month': 'Mês',
+            'DayOfWeek': 'Dia da semana',
+            'OriginCityName': 'Cidade de origem',
+            'DestCityName': 'Cidade de destino',
+        }
+        cols = st.columns(2)
+        with cols[0]:
+            por = st.selectbox('Quebrar por:', options=list(nomes), format_func=nomes.get)
+        with cols[1]:
+            metrica = st.radio('Métrica:', options=['Voos', 'Atrasos', 'Cancelamentos'], horizontal=True)
+        coluna, cor, rotulo = {
+            'Voos': ('NumVoos', COLORS['number'], 'Número de voos'),
+            'Atrasos': ('AtrasoMedio', COLORS['delay'], 'Atraso médio [min]'),
+            'Cancelamentos': ('Cancelados', COLORS['cancel'], 'Número de cancelamentos'),
+        }[metrica]
+
+        tabela = quebra(consulta, selecao, por)
+        if por in ('Month', 'DayOfWeek'):
+            _chart_bar(px.bar(
+                data_frame=tabela, x=por, y=coluna,
+                labels={por: nomes[por], coluna: rotulo},
+                color_discrete_sequence=[cor]
+            ))
+        else:
+            # só as 20 maiores, do menor para cima
             _chart_hbar(px.bar(
-                data_frame=df_city_delay.sort_values(by='AtrasoMedio'),  # menor para cima
-                x='AtrasoMedio',
-                y='DestCityName',
-                orientation='h',
-                color_discrete_sequence=[COLORS['delay']],
-                labels={
-                    'DestCityName': 'Cidade de destino',
-                    'AtrasoMedio': 'Atraso médio [min]'
-                },
-                title='Top 10 cidades com maiores atrasos médios'
+                data_frame=tabela.nlargest(20, coluna).sort_values(coluna),
+                x=coluna, y=por, orientation='h',
+                labels={por: nomes[por], coluna: rotulo},
+                color_discrete_sequence=[cor]
             ))
-    # case 'Temporal':
-    #     st.subheader('Análise temporal')
-    #     cols = st.columns(2)
-    #     with cols[0]:
-    #         scale = st.select_slider('Escala temporal:', options=['Ano', 'Mês', 'Semana', 'Dia'])
-    #     with cols[1]:
-    #         metrica = st.radio('Métrica:', options=['Voos', 'Atrasos', 'Cancelamentos'])
-    #
-    #
-    #     key = {
-    #         'Ano': 'Month',
-    #         'Mês': 'DayOfMonth',
-    #         'Semana': 'DayOfWeek',
-    #         'Dia': 'HourBlock',
-    #     }[scale]
-    #
-    #     label = {
-    #         'Ano': 'Mês',
-    #         'Mês': 'Dia do mês',
-    #         'Semana': 'Dia da semana',
-    #         'Dia': 'Bloco de hora',
-    #     }[scale]
-    #
-    #
-    #     if scale == 'Mês':
-    #         with st.columns([0.5, 0.5])[0]:
-    #             month = st.selectbox('Mês do ano:', options=['Todos', *range(1,13)])
-    #         if month != 'Todos':
-    #             df = df[df['Month'] == month]
-    #
-    #     if scale == 'Dia': df['HourBlock'] = df['ArrTime'] // 100
-    #
-    #     if metrica == 'Cancelamentos':
-    #         df = df[df['Cancelled'] == True]
-    #
-    #     gb = df.groupby(key)
-    #
-    #     match metrica:
-    #         case 'Voos':
-    #             st.subheader(f'Número total de voos por {label}')
-    #             _chart_bar(px.bar(
-    #                 data_frame=gb.size().reset_index(name='count'),
-    #                 labels={key: label, 'count': 'Número de voos'},
-    #                 x=key, y='count',
-    #                 color_discrete_sequence=[COLORS['number']]
-    #             ))
-    #         case 'Atrasos':
-    #             st.subheader(f'Atraso de chegada médio por {label}')
-    #             _chart_bar(px.bar(
-    #                 data_frame=gb['ArrDelay'].mean().reset_index(name='count'),
-    #                 labels={key: label, 'count': 'Tempo médio de atraso [min]'},
-    #                 x=key, y='count',
-    #                 color_discrete_sequence=[COLORS['delay']]
-    #             ))
-    #         case 'Cancelamentos':
-    #             st.subheader(f'Número total de cancelamentos por {label}')
-    #             _chart_bar(px.bar(
-    #                 data_frame=gb.size().reset_index(name='count'),
-    #                 labels={key: label, 'count': 'Número de cancelamentos'},
-    #                 x=key, y='count',
-    #                 color_discrete_sequence=[COLORS['cancel']]
-    #             ))
+
     case "Classificação de Atraso":
         st.subheader("Previsão de Atraso de Voo")
 
-        # Carregar modelo e transformadores
-        modelo = joblib.load("modelo/classificador_voos.pkl")
-        scaler = joblib.load("modelo/scaler_classificacao.pkl")
-        encoder = joblib.load("modelo/encoder_airline_classificacao.pkl")
-        colunas_usadas = joblib.load("modelo/colunas_usadas.pkl")
-
-        # Formulário de entrada
-        with st.form("form_previsao"):
-            airline = st.selectbox("Companhia Aérea:", sorted(encoder.classes_.tolist()))
-            distance = st.number_input("Distância (milhas):", min_value=50, max_value=5000, value=500)
-            month = st.selectbox("Mês do Voo:", list(range(1, 13)))
-            submitted = st.form_submit_button("Prever Atraso")
-
-        if submitted:
-            # Preparar dados para previsão
-            dados = pd.DataFrame({
-                "Airline": [airline],
-                "Distance": [distance],
-                "Month": [month]
-            })
-
-            # Codificação e normalização
-            dados["Airline"] = encoder.transform(dados["Airline"])
-            X_novo = dados[colunas_usadas]
-            X_novo_scaled = scaler.transform(X_novo)
-
-            # Previsão
-            predicao = modelo.predict(X_novo_scaled)
-            resultado = "🔴 Atraso previsto" if predicao[0] == 1 else "🟢 Sem atraso previsto"
-            st.success(f"Resultado da Previsão: {resultado}")
\ No newline at end of file
+        # Modelo e transformadores (carregados uma vez por processo)
+        artefatos = carregar_modelo()
+        encoder = artefatos['encoder']
+
+        aba_voo, aba_lote = st.tabs(["Voo único", "Lote (CSV)"])
+
+        with aba_voo:
+            # Formulário de entrada
+            with st.form("form_previsao"):
+                airline = st.selectbox("Companhia Aérea:", sorted(encoder.classes_.tolist()))
+                distance = st.number_input("Distância (milhas):", min_value=50, max_value=5000, value=500)
+                month = st.selectbox("Mês do Voo:", list(range(1, 13)))
+                submitted = st.form_submit_button("Prever Atraso")
+
+            if submitted:
+                dados = pd.DataFrame({
+                    "Airline": [airline],
+                    "Distance": [distance],
+                    "Month": [month]
+                })
+
+                # Previsão
+                predicao = prever_lote(artefatos, dados)
+                resultado = "🔴 Atraso previsto" if predicao['Atraso'].iloc[0] == 1 else "🟢 Sem atraso previsto"
+                st.success(f"Resultado da Previsão: {resultado}")
+
+        with aba_lote:
+            st.text('Envie um CSV com as colunas Airline, Distance e Month (um voo por linha).')
+            arquivo = st.file_uploader("Voos:", type="csv")
+
+            if arquivo is not None:
+                voos = pd.read_csv(arquivo)
+                faltando = {"Airline", "Distance", "Month"} - set(voos.columns)
+                if faltando:
+                    st.error(f"Colunas ausentes no CSV: {', '.join(sorted(faltando))}")
+                else:
+                    predicoes = prever_lote(artefatos, voos)
+
+                    desconhecidas = predicoes['Atraso'].isna().sum()
+                    if desconhecidas:
+                        st.warning(f"{desconhecidas} voos de companhias desconhecidas pelo modelo não foram classificados.")
+
+                    cols = st.columns(2)
+                    with cols[0]:
+                        st.metric('Voos classificados', format_number(len(predicoes) - desconhecidas), border=True)
+                    with cols[1]:
+                        st.metric('Atrasos previstos', format_number(int(predicoes['Atraso'].sum())), border=True)
+
+                    st.dataframe(predicoes.head(100))
+                    st.download_button("Baixar previsões", predicoes.to_csv(index=False),
+                                       file_name="previsoes_atraso.csv", mime="text/csv")
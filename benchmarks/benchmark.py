@@ -0,0 +1,184 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from sintetico import RAIZ, gerar
+
+# Suíte de escala do pipeline: para cada escala (múltiplo do volume de 2019) gera voos
+# sintéticos, roda cada etapa como um processo separado num diretório de trabalho
+# próprio (cópia de scripts/ com data/, tables/ e modelo/ vazios) e mede o tempo de
+# parede e o pico de memória daquele processo. Os resultados vão para um JSON e são
+# comparados com uma baseline guardada.
+
+# Previsão de um voo e de um lote, medidas dentro do processo (sem import e carga)
+CODIGO_PREDICAO = '''
+import json, sys, time
+sys.path.insert(0, 'scripts')
+from predicao import carregar_artefatos, prever_lote
+from preparar_dados import carregar_preparado
+
+artefatos = carregar_artefatos()
+dados = carregar_preparado()[['Airline', 'Distance', 'Month']]
+lote = dados.sample(min(len(dados), 100_000), random_state=42).astype({'Airline': str}).reset_index(drop=True)
+unico = lote.head(1)
+
+inicio = time.perf_counter()
+for _ in range(20):
+    prever_lote(artefatos, unico)
+unica_ms = (time.perf_counter() - inicio) / 20 * 1000
+
+inicio = time.perf_counter()
+prever_lote(artefatos, lote)
+print(json.dumps({'unica_ms': unica_ms, 'lote_100k_s': time.perf_counter() - inicio}))
+'''
+
+# nome: (diretório de trabalho relativo, argumentos do python)
+ETAPAS = {
+    'reducao': ('scripts', ['reduce_file.py', '../data/raw/voos.parquet', '--saida', '../data/reduced/']),
+    'tabelas': ('scripts', ['gerar_tabelas.py', '--forcar']),
+    'tabelas_sem_mudanca': ('scripts', ['gerar_tabelas.py']),
+    'graficos': ('scripts', ['gerar_graficos.py', '--forcar']),
+    'preparar': ('.', ['scripts/preparar_dados.py']),
+    'treino': ('.', ['scripts/classificacao_modelo.py', '--modelo', 'hist']),
+    'predicao': ('.', ['-c', CODIGO_PREDICAO]),
+}
+
+# diferenças abaixo disso são ruído, não regressão
+MINIMO_SEGUNDOS = 0.5
+MINIMO_MS = 5
+MINIMO_MB = 20
+
+
+def medir(comando, cwd, log):
+    '''Roda o comando e retorna (segundos, pico de memória em MB, última linha da saída).
+    O pico é o ru_maxrss do próprio processo filho, via wait4.'''
+    with open(log, 'w', encoding='utf-8') as saida:
+        inicio = time.perf_counter()
+        processo = subprocess.Popen(comando, cwd=cwd, stdout=saida, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            _, status, uso = os.wait4(processo.pid, 0)
+            processo.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss vem em KB no Linux e em bytes no macOS
+            pico = uso.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+        else:  # Windows
+            processo.wait()
+            pico = None
+        segundos = time.perf_counter() - inicio
+
+    with open(log, encoding='utf-8') as saida:
+        linhas = saida.read().strip().splitlines()
+    if processo.returncode != 0:
+        raise RuntimeError(f'{" ".join(comando[:2])} falhou (código {processo.returncode}); veja {log}')
+    return segundos, pico, linhas[-1] if linhas else ''
+
+
+def rodar_escala(escala, pasta, semente, etapas):
+    '''Roda as etapas numa escala e retorna {etapa: métricas}. Cada etapa depende das
+    anteriores em ETAPAS, que também rodam, mas só as pedidas são registradas.'''
+    sinteticos = os.path.join(pasta, 'sinteticos', f'voos_{escala:g}x_{semente}.parquet')
+    if not os.path.exists(sinteticos):  # a geração não é medida e é reaproveitada entre execuções
+        print(f'Gerando {escala:g}× o volume de 2019...')
+        gerar(sinteticos, escala, semente)
+
+    trabalho = os.path.join(pasta, f'{escala:g}x')
+    shutil.rmtree(trabalho, ignore_errors=True)
+    shutil.copytree(os.path.join(RAIZ, 'scripts'), os.path.join(trabalho, 'scripts'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    for sub in ['data/raw', 'tables', 'modelo', 'logs']:
+        os.makedirs(os.path.join(trabalho, sub), exist_ok=True)
+    try:
+        os.link(sinteticos, os.path.join(trabalho, 'data', 'raw', 'voos.parquet'))
+    except OSError:  # outro sistema de arquivos
+        shutil.copy(sinteticos, os.path.join(trabalho, 'data', 'raw', 'voos.parquet'))
+
+    resultados = {}
+    ultima_etapa = max(list(ETAPAS).index(nome) for nome in etapas)
+    for nome in list(ETAPAS)[:ultima_etapa + 1]:
+        cwd, argumentos = ETAPAS[nome]
+        segundos, pico, ultima = medir([sys.executable, *argumentos], os.path.join(trabalho, cwd),
+                                       os.path.join(trabalho, 'logs', f'{nome}.log'))
+        if nome not in etapas:
+            continue
+        resultados[nome] = {'segundos': segundos, 'pico_mb': pico}
+        if nome == 'predicao':
+            resultados[nome].update(json.loads(ultima))
+        metricas = ', '.join(f'{k} {v:,.2f}' for k, v in resultados[nome].items() if v is not None)
+        print(f'  {nome:<22}{metricas}')
+    return resultados
+
+
+def _minimo(metrica):
+    if metrica.endswith('_mb'):
+        return MINIMO_MB
+    if metrica.endswith('_ms'):
+        return MINIMO_MS
+    if metrica == 'segundos' or metrica.endswith('_s'):
+        return MINIMO_SEGUNDOS
+    return 0
+
+
+def comparar(resultados, baseline, tolerancia):
+    '''Lista de regressões: métricas mais de `tolerancia` acima da baseline'''
+    regressoes = []
+    for escala, etapas in resultados['escalas'].items():
+        for etapa, metricas in etapas.items():
+            anteriores = baseline.get('escalas', {}).get(escala, {}).get(etapa, {})
+            for metrica, valor in metricas.items():
+                anterior = anteriores.get(metrica)
+                if valor is None or anterior is None:
+                    continue
+                if valor > anterior * (1 + tolerancia) and valor - anterior > _minimo(metrica):
+                    regressoes.append(f'{escala} {etapa} {metrica}: {anterior:,.2f} → {valor:,.2f} '
+                                      f'(+{valor / anterior - 1:.0%})')
+    return regressoes
+
+
+if __name__ == '__main__':
+    aqui = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Mede tempo e memória do pipeline em dados sintéticos')
+    parser.add_argument('--escalas', type=float, nargs='+', default=[1],
+                        help='múltiplos do volume de 2019 (ex.: 1 10 100; 0.01 para um teste rápido)')
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--pasta', default=os.path.join(tempfile.gettempdir(), 'voos_benchmark'),
+                        help='onde ficam os dados sintéticos e os diretórios de trabalho')
+    parser.add_argument('--saida', default=os.path.join(aqui, 'resultados.json'))
+    parser.add_argument('--baseline', default=os.path.join(aqui, 'baseline.json'))
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help='grava os resultados como a nova baseline')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='piora relativa aceita antes de acusar regressão')
+    args = parser.parse_args()
+
+    resultados = {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'maquina': {'python': platform.python_version(), 'sistema': platform.platform(),
+                    'processador': platform.processor(), 'nucleos': os.cpu_count()},
+        'escalas': {},
+    }
+    for escala in args.escalas:
+        print(f'Escala {escala:g}×:')
+        resultados['escalas'][f'{escala:g}x'] = rodar_escala(escala, args.pasta, args.semente, args.etapas)
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=1)
+    print(f"✅ Resultados salvos em '{args.saida}'")
+
+    if args.salvar_baseline:
+        shutil.copy(args.saida, args.baseline)
+        print(f"✅ Baseline atualizada em '{args.baseline}'")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        if regressoes:
+            print(f'⚠️ {len(regressoes)} regressões em relação à baseline:')
+            print('\n'.join(f'  {regressao}' for regressao in regressoes))
+            sys.exit(1)
+        print('✅ Sem regressões em relação à baseline')
@@ -0,0 +1,88 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Gerador determinístico de voos sintéticos no formato do parquet original do Kaggle
+# (as colunas que reduce_file.py lê), para medir o pipeline sem baixar o dataset.
+# Companhias, cidades, cancelamentos e atrasos médios seguem as tabelas de 2019 em tables/.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VOOS_2019 = 8_091_684
+
+
+def _perfis(tables=os.path.join(RAIZ, 'tables')):
+    companhias = pd.read_csv(os.path.join(tables, 'voos_delay.csv')).set_index('Airline')
+    cancelados = pd.read_csv(os.path.join(tables, 'cancel_counts.csv')).set_index('Airline')
+    companhias['PctCancelados'] = cancelados['VoosCanceladosPct'].reindex(companhias.index).fillna(0)
+    cidades = pd.read_csv(os.path.join(tables, 'voos_por_cidade.csv'))
+    return companhias, cidades
+
+
+def _lote(rng, n, companhias, cidades, ano):
+    comp = rng.choice(len(companhias), n, p=(companhias['NumVoos'] / companhias['NumVoos'].sum()).to_numpy())
+    peso_cidades = (cidades['TotalVoos'] / cidades['TotalVoos'].sum()).to_numpy()
+    origem = rng.choice(len(cidades), n, p=peso_cidades)
+    destino = rng.choice(len(cidades), n, p=peso_cidades)
+
+    inicio = np.datetime64(f'{ano}-01-01')
+    dias = (np.datetime64(f'{ano + 1}-01-01') - inicio).astype(int)
+    data = inicio + rng.integers(0, dias, n).astype('timedelta64[D]')
+    mes = data.astype('datetime64[M]')
+
+    cancelado = rng.random(n) * 100 < companhias['PctCancelados'].to_numpy()[comp]
+    # atraso com cauda longa (gama) e a média de cada companhia em 2019
+    media = companhias['AtrasoMedio'].to_numpy()[comp]
+    atraso = np.round(rng.gamma(0.5, 2 * (np.maximum(media, 0) + 15)) - 15)
+    chegada = rng.integers(1, 2400, n).astype('float64')
+
+    return pd.DataFrame({
+        'Airline': companhias.index.to_numpy()[comp],
+        'Cancelled': cancelado,
+        'ArrDelay': np.where(cancelado, np.nan, atraso),
+        'OriginCityName': cidades['DestCityName'].to_numpy()[origem],
+        'DestCityName': cidades['DestCityName'].to_numpy()[destino],
+        # distância fixa por rota, para os agregados por faixa/rota fazerem sentido
+        'Distance': (31 + (origem * 7919 + destino * 104729) % 5000).astype('float64'),
+        'Year': np.full(n, ano, dtype='int64'),
+        'Month': (mes.astype(int) % 12 + 1).astype('int64'),
+        'DayofMonth': ((data - mes.astype('datetime64[D]')).astype(int) + 1).astype('int64'),
+        # 1970-01-01 foi uma quinta-feira; 1 = segunda-feira, como no dataset original
+        'DayOfWeek': ((data.astype(int) + 3) % 7 + 1).astype('int64'),
+        'ArrTime': np.where(cancelado, np.nan, chegada),
+    })
+
+
+def gerar(path, escala=1.0, semente=42, ano=2019, tamanho_lote=1_000_000):
+    '''Escreve `escala` × o volume de 2019 em voos sintéticos em `path`, um lote por vez
+    (a memória não cresce com a escala). Mesma semente, mesmo arquivo.'''
+    companhias, cidades = _perfis()
+    total = round(VOOS_2019 * escala)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = None
+    try:
+        for i, inicio in enumerate(range(0, total, tamanho_lote)):
+            rng = np.random.default_rng([semente, i])
+            tabela = pa.Table.from_pandas(_lote(rng, min(tamanho_lote, total - inicio), companhias, cidades, ano),
+                                          preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, tabela.schema)
+            writer.write_table(tabela)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera voos sintéticos no formato do parquet original')
+    parser.add_argument('saida')
+    parser.add_argument('--escala', type=float, default=1.0, help='múltiplo do volume de 2019')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--ano', type=int, default=2019)
+    args = parser.parse_args()
+
+    total = gerar(args.saida, args.escala, args.semente, args.ano)
+    print(f"✅ {total:,} voos sintéticos salvos em '{args.saida}'")
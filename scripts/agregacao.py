@@ -0,0 +1,380 @@
+import numpy as np
+import pandas as pd
+
+# atrasos por faixa de distância
+bins = [0, 250, 500, 750, 1000, 1250, 1500, 2000, 3000, 4000, 5000]
+labels = ['0–250', '251–500', '501–750', '751–1000', '1001–1250', '1251–1500',
+          '1501–2000', '2001–3000', '3001–4000', '4001–5000']
+
+CHAVES = ['Airline', 'DestCityName', 'FaixaDistancia']
+
+# chaves do cubo da página "Temporal"
+CHAVES_CUBO = ['Year', 'Month', 'DayOfMonth', 'DayOfWeek', 'HourBlock', 'Airline']
+
+# Quantis de ArrDelay: histograma em buckets logarítmicos (estilo DDSketch). Todo
+# valor cai num bucket cujo representante tem erro relativo de no máximo ERRO_QUANTIL,
+# e histogramas de arquivos diferentes se combinam somando contagens.
+ERRO_QUANTIL = 0.01
+GAMA = (1 + ERRO_QUANTIL) / (1 - ERRO_QUANTIL)
+QUANTIS = {'P50': 0.5, 'P90': 0.9, 'P99': 0.99}
+# Níveis com tabela de quantis; o histograma guarda um rollup por nível, não o produto
+NIVEIS_QUANTIS = ['Airline', 'DestCityName', 'FaixaDistancia']
+
+# Rotas (companhia, origem → destino): resumo de heavy hitters com no máximo
+# ROTAS_POR_COMPANHIA rotas por companhia. Limiar é o máximo de voos que uma rota
+# fora do resumo pode ter e ErroMax, quantos voos de uma rota podem ter ficado de fora.
+CHAVES_ROTA = ['Airline', 'OriginCityName', 'DestCityName']
+ROTAS_POR_COMPANHIA = 1000
+MIN_VOOS_ROTA = 50  # rotas com menos voos não entram no ranking de atraso médio
+
+
+def _faixas(df):
+    return pd.cut(df['Distance'], bins=bins, labels=labels)
+
+
+def agregar(df):
+    '''Faz uma única passada nos voos e devolve contagens e somas por
+    (companhia, cidade de destino, faixa de distância).
+
+    Todas as tabelas do dashboard saem de rollups desse resultado, que tem
+    poucos milhares de linhas, em vez de um groupby no dataset inteiro por tabela.'''
+    faixa = _faixas(df)
+    # somas acumuladas em float64 mesmo quando o frame compacto guarda float32
+    return (df.assign(FaixaDistancia=faixa, Cancelled=df['Cancelled'] == True,
+                      ArrDelay=df['ArrDelay'].astype('float64'),
+                      Distance=df['Distance'].astype('float64'))
+            .groupby(CHAVES, observed=True, dropna=False, sort=False)
+            .agg(NumVoos=('Airline', 'size'),
+                 Cancelados=('Cancelled', 'sum'),
+                 SomaAtraso=('ArrDelay', 'sum'),
+                 NumAtraso=('ArrDelay', 'count'),
+                 SomaDistancia=('Distance', 'sum'),
+                 NumDistancia=('Distance', 'count')))
+
+
+def cubo_temporal(df):
+    '''Cubo pré-agregado Year × Month × DayOfMonth × DayOfWeek × HourBlock × Airline com
+    número de voos, soma/contagem de ArrDelay e cancelamentos. Qualquer combinação
+    de escala, métrica e mês da página "Temporal" é um rollup desse cubo.'''
+    return (df.assign(Cancelled=df['Cancelled'] == True,
+                      ArrDelay=df['ArrDelay'].astype('float64'))
+            .groupby(CHAVES_CUBO, observed=True, sort=True)
+            .agg(NumVoos=('Airline', 'size'),
+                 SomaAtraso=('ArrDelay', 'sum'),
+                 NumAtraso=('ArrDelay', 'count'),
+                 Cancelados=('Cancelled', 'sum'))
+            .astype({'NumVoos': 'int32', 'NumAtraso': 'int32', 'Cancelados': 'int32'})
+            .reset_index())
+
+
+def bucket_atraso(valores):
+    '''Bucket de cada atraso: 0 para |x| < 1 min, ±(i + 1) para γ^(i-1) < |x| ≤ γ^i'''
+    valores = np.asarray(valores, dtype='float64')
+    absolutos = np.abs(valores)
+    indices = np.ceil(np.log(np.maximum(absolutos, 1)) / np.log(GAMA)) + 1
+    return (np.sign(valores) * np.where(absolutos < 1, 0, indices)).astype('int16')
+
+
+def valor_bucket(buckets):
+    '''Valor representante de cada bucket, a menos de ERRO_QUANTIL do valor real'''
+    buckets = np.asarray(buckets)
+    valores = 2 * GAMA ** (np.abs(buckets) - 1.0) / (GAMA + 1)
+    return np.sign(buckets) * valores
+
+
+def histograma_atrasos(df):
+    '''Contagem de voos por bucket de ArrDelay em cada nível de NIVEIS_QUANTIS:
+    (Nivel, Chave, BucketAtraso), ex.: ('Airline', 'Delta Air Lines Inc.', 12). Cada
+    chave tem no máximo algumas centenas de buckets, então o tamanho depende do número
+    de companhias, cidades e faixas, não do número de voos.'''
+    df = df[df['ArrDelay'].notna()]
+    df = df.assign(FaixaDistancia=_faixas(df), BucketAtraso=bucket_atraso(df['ArrDelay']))
+    partes = [df.groupby([nivel, 'BucketAtraso'], observed=True, sort=False).size()
+              .rename_axis(['Chave', 'BucketAtraso']).reset_index(name='Contagem')
+              .astype({'Chave': str}).assign(Nivel=nivel)
+              for nivel in NIVEIS_QUANTIS]
+    return pd.concat(partes).set_index(['Nivel', 'Chave', 'BucketAtraso'])
+
+
+def _podar_rotas(rotas, k=ROTAS_POR_COMPANHIA):
+    '''Mantém as k rotas com mais voos (no pior caso) de cada companhia. O Limiar da
+    companhia passa a cobrir também a maior rota descartada.'''
+    rotas = rotas.assign(Teto=rotas['NumVoos'] + rotas['ErroMax']).sort_values('Teto', ascending=False)
+    posicao = rotas.groupby('Airline', observed=True).cumcount()
+    descartado = rotas[posicao >= k].groupby('Airline', observed=True)['Teto'].max()
+    rotas = rotas[posicao < k]
+    limiar = np.maximum(rotas['Limiar'].to_numpy(),
+                        descartado.reindex(rotas['Airline']).fillna(0).to_numpy())
+    return rotas.drop(columns='Teto').assign(Limiar=limiar.astype('int64')).reset_index(drop=True)
+
+
+def rotas(df):
+    '''Voos e soma de atrasos por rota de cada companhia, reduzidos ao resumo de
+    heavy hitters: o estado guardado não cresce com o número de rotas.'''
+    contagem = (df.assign(ArrDelay=df['ArrDelay'].astype('float64'))
+                .groupby(CHAVES_ROTA, observed=True, sort=False)
+                .agg(NumVoos=('Airline', 'size'),
+                     SomaAtraso=('ArrDelay', 'sum'),
+                     NumAtraso=('ArrDelay', 'count'))
+                .reset_index()
+                .assign(ErroMax=0, Limiar=0))
+    return _podar_rotas(contagem)
+
+
+def _limiares(rotas):
+    return rotas.groupby('Airline', observed=True)['Limiar'].first()
+
+
+def combinar_rotas(partes):
+    '''Soma resumos de rotas parciais. Uma rota ausente de uma parte pode ter tido
+    até o Limiar daquela parte em voos, que entra no ErroMax dela.
+
+    O AtrasoMedio derivado de SomaAtraso/NumAtraso é aproximado quando ErroMax > 0:
+    os voos das partes em que a rota foi podada não entram nem na soma nem na
+    contagem, então a média é só dos voos contados (até ErroMax voos ficam de fora).'''
+    if len(partes) == 1:
+        return partes[0]
+    limiares = pd.concat([_limiares(parte) for parte in partes]).groupby(level=0, observed=True).sum()
+    rotas = (pd.concat(partes)
+             .groupby(CHAVES_ROTA, observed=True, sort=False)
+             [['NumVoos', 'SomaAtraso', 'NumAtraso', 'ErroMax', 'Limiar']].sum()
+             .reset_index())
+    total = limiares.reindex(rotas['Airline']).to_numpy()
+    rotas['ErroMax'] += total - rotas['Limiar']
+    rotas['Limiar'] = total
+    return _podar_rotas(rotas)
+
+
+def combinar_agregados(partes):
+    '''Soma agregados base parciais (de arquivos/meses diferentes). Como o estado
+    só tem contagens e somas, o resultado é idêntico ao de `agregar` sobre a união.'''
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat(partes).groupby(level=CHAVES, observed=True, dropna=False, sort=False).sum()
+
+
+def combinar_cubos(partes):
+    '''Soma cubos temporais parciais, como `combinar_agregados`'''
+    if len(partes) == 1:
+        return partes[0]
+    return (pd.concat(partes).groupby(CHAVES_CUBO, observed=True, sort=True).sum()
+            .astype({'NumVoos': 'int32', 'NumAtraso': 'int32', 'Cancelados': 'int32'})
+            .reset_index())
+
+
+def combinar_histogramas(partes):
+    '''Soma histogramas de atraso parciais, como `combinar_agregados`'''
+    if len(partes) == 1:
+        return partes[0]
+    return pd.concat(partes).groupby(level=['Nivel', 'Chave', 'BucketAtraso'], sort=False).sum()
+
+
+def quantis_atraso(hist, nivel):
+    '''Quantis de QUANTIS do atraso por Airline, DestCityName ou FaixaDistancia,
+    a partir do histograma de `histograma_atrasos`'''
+    contagens = hist['Contagem'][hist.index.get_level_values('Nivel') == nivel].droplevel('Nivel')
+    linhas = {}
+    for chave, grupo in contagens.groupby(level='Chave'):
+        grupo = grupo.sort_index(level='BucketAtraso')
+        acumulado = grupo.to_numpy().cumsum()
+        total = acumulado[-1]
+        buckets = grupo.index.get_level_values('BucketAtraso').to_numpy()
+        # menor bucket com mais de q·(n - 1) valores até ele
+        posicoes = np.searchsorted(acumulado, [q * (total - 1) for q in QUANTIS.values()], side='right')
+        linhas[str(chave)] = [total, *valor_bucket(buckets[posicoes])]
+    out = pd.DataFrame.from_dict(linhas, orient='index', columns=['NumAtraso', *QUANTIS])
+    return out.astype({'NumAtraso': 'int64'}).rename_axis(nivel).sort_index()
+
+
+def _rollup(agg, nivel):
+    '''Soma o agregado base até um único nível (Airline, DestCityName ou FaixaDistancia)'''
+    out = agg.groupby(level=nivel, observed=True).sum()
+    # ordem alfabética, não a ordem dos códigos das categóricas
+    out = out.set_axis(out.index.astype(str)).sort_index()
+    out['AtrasoMedio'] = out['SomaAtraso'] / out['NumAtraso']
+    out['DistanciaMedia'] = out['SomaDistancia'] / out['NumDistancia']
+    return out
+
+
+def tabela_metricas_gerais(agg):
+    por_comp = _rollup(agg, 'Airline')
+    return pd.DataFrame({
+        'Names': ['nAirlines', 'nCities', 'nFlights'],
+        'Values': [len(por_comp), len(_rollup(agg, 'DestCityName')), int(por_comp['NumVoos'].sum())]
+    })
+
+
+def tabela_voos_por_companhia(agg):
+    return (_rollup(agg, 'Airline')['NumVoos'].rename('TotalVoos').reset_index()
+            .sort_values('TotalVoos'))
+
+
+def tabela_voos_por_cidade(agg):
+    return (_rollup(agg, 'DestCityName')['NumVoos'].rename('TotalVoos').reset_index()
+            .sort_values('TotalVoos'))
+
+
+def tabela_dist_por_comp(agg):
+    return _rollup(agg, 'Airline')['DistanciaMedia'].rename('Distance').sort_values().to_frame()
+
+
+def tabela_atrasi_por_comp(agg):
+    return _rollup(agg, 'Airline')['AtrasoMedio'].rename('ArrDelay').sort_values().to_frame()
+
+
+def tabela_cancel_counts(agg):
+    por_comp = _rollup(agg, 'Airline')
+    cancel_counts = (por_comp[por_comp['Cancelados'] > 0]
+                     .sort_values('Cancelados', ascending=False)
+                     .rename(columns={'Cancelados': 'VoosCancelados'}))
+    cancel_counts['VoosCanceladosPct'] = cancel_counts['VoosCancelados'] / cancel_counts['NumVoos'] * 100
+    return cancel_counts[['VoosCancelados', 'VoosCanceladosPct']].reset_index()
+
+
+def tabela_voos_delay(agg):
+    return _rollup(agg, 'Airline')[['AtrasoMedio', 'NumVoos']].reset_index()
+
+
+def tabela_perfis_companhias(agg):
+    '''Perfil de cada companhia, com nome: base dos gráficos estáticos por companhia'''
+    return (_rollup(agg, 'Airline')[['NumVoos', 'AtrasoMedio', 'DistanciaMedia']]
+            .rename_axis('Airline').reset_index())
+
+
+def tabela_atrasos_por_faixa(agg):
+    por_faixa = _rollup(agg, 'FaixaDistancia').reindex(labels)
+    return por_faixa['AtrasoMedio'].rename('ArrDelay').rename_axis('FaixaDistancia').reset_index()
+
+
+def tabela_atrasos_por_cidade(agg):
+    return _rollup(agg, 'DestCityName')[['AtrasoMedio', 'NumVoos']].reset_index()
+
+
+def tabela_city_delay(agg):
+    return (_rollup(agg, 'DestCityName')['AtrasoMedio']
+            .sort_values(ascending=False)
+            .head(10)
+            .reset_index()
+            .sort_values(by='AtrasoMedio'))
+
+
+# CSVs de `tables/` derivados do agregado base. dist_por_comp e atrasi_por_comp
+# são escritos sem a coluna Airline, como o app espera.
+TABELAS = {
+    'metricas_gerais.csv': tabela_metricas_gerais,
+    'voos_por_companhia.csv': tabela_voos_por_companhia,
+    'voos_por_cidade.csv': tabela_voos_por_cidade,
+    'dist_por_comp.csv': tabela_dist_por_comp,
+    'atrasi_por_comp.csv': tabela_atrasi_por_comp,
+    'cancel_counts.csv': tabela_cancel_counts,
+    'voos_delay.csv': tabela_voos_delay,
+    'perfis_companhias.csv': tabela_perfis_companhias,
+    'atrasos_por_faixa.csv': tabela_atrasos_por_faixa,
+    'atrasos_por_cidade.csv': tabela_atrasos_por_cidade,
+    'city_delay.csv': tabela_city_delay,
+}
+
+
+def tabela_quantis_por_comp(hist):
+    return quantis_atraso(hist, 'Airline').reset_index()
+
+
+def tabela_quantis_por_cidade(hist):
+    return quantis_atraso(hist, 'DestCityName').reset_index()
+
+
+def tabela_quantis_por_faixa(hist):
+    por_faixa = quantis_atraso(hist, 'FaixaDistancia').reindex(labels)
+    return por_faixa.rename_axis('FaixaDistancia').reset_index()
+
+
+# CSVs de `tables/` com os quantis de atraso, derivados do histograma de atrasos
+TABELAS_QUANTIS = {
+    'quantis_por_comp.csv': tabela_quantis_por_comp,
+    'quantis_por_cidade.csv': tabela_quantis_por_cidade,
+    'quantis_por_faixa.csv': tabela_quantis_por_faixa,
+}
+
+
+def _ranking_rotas(rotas, k, coluna):
+    '''Top-k rotas por `coluna` no geral (Airline = "Todas") e dentro de cada companhia,
+    do menor para o maior como os gráficos de barras horizontais esperam'''
+    por_comp = rotas.astype({col: str for col in CHAVES_ROTA})
+    # no geral, uma companhia em que a rota ficou fora do resumo pode ter tido até o Limiar dela
+    limiar_total = _limiares(rotas).sum()
+    geral = (por_comp.groupby(['OriginCityName', 'DestCityName'], sort=False)
+             [['NumVoos', 'SomaAtraso', 'NumAtraso', 'ErroMax', 'Limiar']].sum().reset_index()
+             .assign(Airline='Todas'))
+    geral['ErroMax'] += limiar_total - geral['Limiar']
+
+    tabela = pd.concat([geral, por_comp])
+    tabela['Rota'] = tabela['OriginCityName'] + ' → ' + tabela['DestCityName']
+    tabela['AtrasoMedio'] = tabela['SomaAtraso'] / tabela['NumAtraso']
+    if coluna == 'AtrasoMedio':
+        tabela = tabela[tabela['NumVoos'] >= MIN_VOOS_ROTA]
+    top = (tabela.sort_values(['Airline', coluna], ascending=[True, False])
+           .groupby('Airline', sort=False).head(k))
+    top = top.sort_values(['Airline', coluna], kind='stable')
+    return top[['Airline', 'Rota', 'NumVoos', 'ErroMax', 'AtrasoMedio']].reset_index(drop=True)
+
+
+def tabela_rotas_movimentadas(rotas, k=10):
+    return _ranking_rotas(rotas, k, 'NumVoos')
+
+
+def tabela_rotas_atrasadas(rotas, k=10):
+    return _ranking_rotas(rotas, k, 'AtrasoMedio')
+
+
+# CSVs de `tables/` com os rankings de rotas, derivados do resumo de rotas
+TABELAS_ROTAS = {
+    'rotas_movimentadas.csv': tabela_rotas_movimentadas,
+    'rotas_atrasadas.csv': tabela_rotas_atrasadas,
+}
+
+
+def escrever_tabelas(agg, outpath):
+    '''Escreve os CSVs de `tables/` a partir do agregado base'''
+    for arquivo, tabela in TABELAS.items():
+        tabela(agg).to_csv(outpath + arquivo, index=False)
+
+
+def top_destinos(agg, k=10):
+    '''Top-k cidades de destino de cada companhia, a partir de uma única
+    contagem por (Airline, DestCityName). Ordenado do menor para o maior
+    dentro de cada companhia, como os gráficos de barras horizontais esperam.'''
+    contagem = (agg['NumVoos'].groupby(level=['Airline', 'DestCityName'], observed=True).sum()
+                .rename('count').reset_index()
+                .astype({'Airline': str, 'DestCityName': str}))
+    contagem = contagem[contagem['count'] > 0]
+    top = (contagem.sort_values(['Airline', 'count'], ascending=[True, False])
+           .groupby('Airline', sort=False).head(k))
+    return top.sort_values(['Airline', 'count'], kind='stable').reset_index(drop=True)
+
+
+def escrever_destinos(agg, outpath, formato='csv', k=10):
+    '''Escreve o ranking de destinos por companhia.
+
+    formato='csv' gera um arquivo `comps/<Companhia>_destinos.csv` por companhia;
+    formato='parquet' gera um único `destinos_por_comp.parquet` com um row group por
+    companhia, de modo que o app lê só a fatia de uma companhia via filtro.
+
+    Retorna os arquivos escritos, relativos a outpath.'''
+    top = top_destinos(agg, k)
+
+    if formato == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabela = pa.Table.from_pandas(top, preserve_index=False)
+        with pq.ParquetWriter(outpath + 'destinos_por_comp.parquet', tabela.schema) as writer:
+            for comp, fatia in top.groupby('Airline', sort=True):
+                writer.write_table(pa.Table.from_pandas(fatia, schema=tabela.schema, preserve_index=False))
+        return ['destinos_por_comp.parquet']
+
+    arquivos = []
+    for comp, fatia in top.groupby('Airline', sort=False):
+        arquivo = f"comps/{comp.split(' ')[0]}_destinos.csv"
+        fatia[['DestCityName', 'count']].to_csv(outpath + arquivo, index=False)
+        arquivos.append(arquivo)
+    return arquivos
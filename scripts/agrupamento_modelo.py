@@ -1,39 +1,155 @@
-import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from scipy.cluster.hierarchy import linkage, dendrogram
+from sklearn.cluster import MiniBatchKMeans
+from scipy.cluster.hierarchy import linkage, dendrogram, fcluster
+import matplotlib
+matplotlib.use("Agg")  # só grava o PNG; não abre janela nem bloqueia o script
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import argparse
 import os
 
-# --- Carregar dados ---
-df = pd.read_csv("data/dados_agrupamento.csv")
+from preparar_dados import carregar_preparado
+from voos import lotes_voos
+
+NIVEIS = {
+    # nível: (arquivo do dendrograma, descrição)
+    'companhia': ('dendrograma_companhias.png', 'Companhias Aéreas'),
+    'cidade': ('dendrograma_cidades.png', 'Cidades de destino'),
+    'rota': ('dendrograma_rotas.png', 'Rotas (origem → destino)'),
+}
+
+parser = argparse.ArgumentParser(description='Agrupamento hierárquico por atraso médio e distância média')
+parser.add_argument('--nivel', choices=list(NIVEIS), default='companhia',
+                    help='entidade agrupada')
+parser.add_argument('--max-resumos', type=int, default=500,
+                    help='acima desse número de entidades, elas são resumidas por mini-batch '
+                         'k-means e o Ward roda sobre os resumos, ponderados pelo número de '
+                         'entidades de cada um (memória O(max_resumos²))')
+parser.add_argument('--n-grupos', type=int, default=5,
+                    help='número de grupos no corte do dendrograma salvo em data/grupos_<nivel>.csv')
+args = parser.parse_args()
+
+
+def perfis(nivel):
+    '''Atraso médio e distância média por entidade, só com voos não cancelados. Nos
+    níveis cidade e rota o dataset reduzido é lido em lotes, e só as somas e contagens
+    de cada entidade ficam em memória.'''
+    if nivel == 'companhia':
+        df = carregar_preparado()
+        return df.groupby(['Airline'], observed=True).agg({
+            "ArrDelay": "mean",
+            "Distance": "mean"
+        }).dropna()
+
+    chave = ['DestCityName'] if nivel == 'cidade' else ['OriginCityName', 'DestCityName']
+    somas = None
+    for lote in lotes_voos("data/reduced", columns=chave + ["Distance", "ArrDelay", "Cancelled"]):
+        lote = lote[lote["Cancelled"] == False]
+        parcial = (lote[["ArrDelay", "Distance"]].astype("float64")
+                   .groupby([lote[col] for col in chave], observed=True).agg(['sum', 'count']))
+        somas = parcial if somas is None else pd.concat([somas, parcial]).groupby(level=chave, observed=True).sum()
+
+    # média de cada coluna só sobre os voos em que ela não é nula, como no agg("mean")
+    grouped = (somas.xs('sum', axis=1, level=1) / somas.xs('count', axis=1, level=1)).dropna()
+    if nivel == 'rota':
+        grouped = grouped.set_axis(grouped.index.map(lambda rota: f'{rota[0]} → {rota[1]}')).rename_axis('Rota')
+    return grouped
+
+
+def resumir(X, n_resumos, tamanho_lote=10_000):
+    '''Comprime os pontos em `n_resumos` centróides com mini-batch k-means, lendo
+    `tamanho_lote` pontos por vez. Retorna os centróides não vazios, o número de
+    pontos de cada um e o resumo de cada ponto.'''
+    tamanho_lote = max(tamanho_lote, n_resumos)
+    kmeans = MiniBatchKMeans(n_clusters=n_resumos, random_state=42, n_init=1)
+    for inicio in range(0, len(X), tamanho_lote):
+        lote = X[inicio:inicio + tamanho_lote]
+        if len(lote) >= n_resumos:  # o último lote pode ser pequeno demais para o partial_fit
+            kmeans.partial_fit(lote)
+    rotulos = np.concatenate([kmeans.predict(X[inicio:inicio + tamanho_lote])
+                              for inicio in range(0, len(X), tamanho_lote)])
+    # Centróides sem nenhum ponto não representam entidade alguma
+    usados, rotulos = np.unique(rotulos, return_inverse=True)
+    return kmeans.cluster_centers_[usados], np.bincount(rotulos), rotulos
 
-# --- Agrupar por companhia aérea ---
-df_grouped = df.groupby("Airline").agg({
-    "ArrDelay": "mean",
-    "Distance": "mean"
-}).dropna()
+
+def ward_ponderado(pontos, pesos):
+    '''Ward sobre centróides que representam `pesos` pontos cada: o custo de unir
+    dois grupos usa o número de pontos originais, não o de centróides, então o
+    resultado aproxima o Ward sobre as entidades. Retorna a matriz no formato do
+    scipy (a 4ª coluna conta centróides, para o dendrogram/fcluster).'''
+    n = len(pontos)
+    centros = pontos.astype('float64').copy()
+    tamanhos = np.asarray(pesos, dtype='float64').copy()
+    folhas = np.ones(n)
+    ids = np.arange(n)
+
+    def custo(i, outros):
+        d2 = ((centros[outros] - centros[i]) ** 2).sum(axis=1)
+        return np.sqrt(2 * tamanhos[i] * tamanhos[outros] / (tamanhos[i] + tamanhos[outros]) * d2)
+
+    distancias = np.stack([custo(i, np.arange(n)) for i in range(n)])
+    np.fill_diagonal(distancias, np.inf)
+    ativos = np.ones(n, dtype=bool)
+    linked = np.empty((n - 1, 4))
+    for passo in range(n - 1):
+        i, j = sorted(divmod(int(distancias.argmin()), n))
+        linked[passo] = [min(ids[i], ids[j]), max(ids[i], ids[j]), distancias[i, j], folhas[i] + folhas[j]]
+        # O grupo novo fica no lugar de i; j sai da matriz
+        centros[i] = (tamanhos[i] * centros[i] + tamanhos[j] * centros[j]) / (tamanhos[i] + tamanhos[j])
+        tamanhos[i] += tamanhos[j]
+        folhas[i] += folhas[j]
+        ids[i] = n + passo
+        ativos[j] = False
+        distancias[j, :] = distancias[:, j] = np.inf
+        outros = np.flatnonzero(ativos)
+        outros = outros[outros != i]
+        distancias[i, outros] = distancias[outros, i] = custo(i, outros)
+    return linked
+
+
+# --- Carregar dados e agrupar por entidade ---
+df_grouped = perfis(args.nivel)
 
 # --- Normalizar os dados ---
 scaler = StandardScaler()
 X_scaled = scaler.fit_transform(df_grouped)
 
-# --- Gerar dendrograma ---
-linked = linkage(X_scaled, method='ward')
+# --- Ward; entidades demais são resumidas antes ---
+if len(X_scaled) > args.max_resumos:
+    pontos, pesos, resumo_da_entidade = resumir(X_scaled, args.max_resumos)
+    linked = ward_ponderado(pontos, pesos)
+else:
+    pontos, resumo_da_entidade = X_scaled, np.arange(len(X_scaled))
+    linked = linkage(pontos, method='ward')
 
+# --- Gerar dendrograma ---
+arquivo, descricao = NIVEIS[args.nivel]
 plt.figure(figsize=(12, 6))
-dendrogram(
-    linked,
-    labels=df_grouped.index.tolist(),
-    leaf_rotation=90,
-    leaf_font_size=10
-)
-
-plt.title("Dendrograma - Companhias Aéreas por Atraso Médio e Distância Média")
-plt.xlabel("Companhias Aéreas")
+if len(pontos) == len(df_grouped) and len(pontos) <= 60:
+    dendrogram(
+        linked,
+        labels=df_grouped.index.tolist(),
+        leaf_rotation=90,
+        leaf_font_size=10
+    )
+else:
+    dendrogram(linked, truncate_mode='lastp', p=40, leaf_rotation=90, leaf_font_size=10)
+
+plt.title(f"Dendrograma - {descricao} por Atraso Médio e Distância Média ({len(df_grouped):,} entidades)")
+plt.xlabel(descricao)
 plt.ylabel("Distância (Ward linkage)")
 plt.tight_layout()
 
+# --- Salvar grupos de cada entidade ---
+grupo_do_ponto = fcluster(linked, t=min(args.n_grupos, len(pontos)), criterion='maxclust')
+df_grouped['Grupo'] = grupo_do_ponto[resumo_da_entidade]
+os.makedirs("data", exist_ok=True)
+df_grouped.to_csv(f"data/grupos_{args.nivel}.csv")
+
 # --- Salvar gráfico ---
 os.makedirs("graficos", exist_ok=True)
-plt.savefig("graficos/dendrograma_companhias.png", dpi=300, bbox_inches="tight")
-plt.show()
+plt.savefig(f"graficos/{arquivo}", dpi=300, bbox_inches="tight")
+plt.close()
+print(f"✅ Dendrograma salvo em 'graficos/{arquivo}' e grupos em 'data/grupos_{args.nivel}.csv'")
@@ -0,0 +1,75 @@
+import argparse
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from voos import filtros_voos, lotes_voos
+
+# Amostragem por prioridade (bottom-k): cada voo recebe uma chave pseudoaleatória e
+# ficam os n de menor chave, no total ou por estrato. Lendo lote a lote, só a amostra
+# corrente fica em memória; e amostras de arquivos diferentes se combinam mantendo as
+# n menores chaves. A chave é um hash do conteúdo do voo com a semente, então a
+# amostra é reprodutível e não depende da divisão em lotes ou arquivos.
+SEMENTE = 42
+PATH_AMOSTRA_TREINO = "data/amostra_treino.arrow"
+
+
+def chaves_amostra(df, semente=SEMENTE):
+    '''Chave uniforme em [0, 1) de cada voo, determinada pelo conteúdo e pela semente'''
+    hashes = pd.util.hash_pandas_object(df, index=False, hash_key=f'{semente:016d}'[-16:])
+    return hashes.to_numpy() / 2.0**64
+
+
+def menores(df, n, estratos=None):
+    '''As n linhas de menor ChaveAmostra, no total ou dentro de cada estrato'''
+    if not estratos:
+        return df.nsmallest(n, 'ChaveAmostra')
+    return (df.sort_values('ChaveAmostra')
+            .groupby(list(estratos), observed=True, sort=False, dropna=False).head(n))
+
+
+def amostrar_lotes(lotes, n, estratos=None, semente=SEMENTE):
+    '''Amostra uniforme de n voos (ou n por estrato) de uma sequência de lotes, lidos
+    uma vez. Sem voos, a amostra é vazia, com as colunas dos lotes e ChaveAmostra.'''
+    amostra = None
+    for lote in lotes:
+        lote = lote.assign(ChaveAmostra=chaves_amostra(lote, semente))
+        amostra = menores(lote if amostra is None else pd.concat([amostra, lote]), n, estratos)
+    if amostra is None:
+        return pd.DataFrame({'ChaveAmostra': pd.Series(dtype='float64')})
+    return amostra
+
+
+def combinar_amostras(partes, n, estratos=None):
+    return menores(pd.concat(partes), n, estratos)
+
+
+if __name__ == '__main__':
+    from preparar_dados import preparar, tipos
+
+    parser = argparse.ArgumentParser(description='Gera uma amostra de treino para o classificador '
+                                                 'lendo o dataset reduzido em lotes')
+    parser.add_argument('--tamanho', type=int, default=1_000_000,
+                        help='voos na amostra (por estrato, com --por)')
+    # sem Cancelled: preparar() descarta os voos cancelados, então o estrato sumiria
+    parser.add_argument('--por', nargs='+', choices=['Airline', 'Month'],
+                        help='estratifica a amostra por estas colunas')
+    parser.add_argument('--semente', type=int, default=SEMENTE)
+    parser.add_argument('--anos', type=int, nargs='+', help='só voos destes anos')
+    parser.add_argument('--meses', type=int, nargs='+', help='só voos destes meses')
+    parser.add_argument('--companhias', nargs='+', help='só voos destas companhias')
+    parser.add_argument('--saida', default=PATH_AMOSTRA_TREINO)
+    args = parser.parse_args()
+
+    colunas = sorted({*tipos, 'Cancelled', *(args.por or [])})
+    lotes = lotes_voos("data/reduced", columns=colunas,
+                       filtros=filtros_voos(args.anos, args.meses, args.companhias))
+    amostra = amostrar_lotes(lotes, args.tamanho, args.por, args.semente)
+
+    # mesmo formato de dados_agrupamento.arrow, para o classificacao_modelo.py --dados
+    amostra = preparar(amostra.sort_values('ChaveAmostra'))
+    os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+    feather.write_feather(amostra, args.saida, compression='uncompressed')
+
+    print(f"✅ Amostra com {len(amostra):,} voos salva em '{args.saida}'")
@@ -1,40 +1,100 @@
-import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import FunctionTransformer, LabelEncoder
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.metrics import classification_report
+import argparse
 import joblib
 import os
 
+import instrumentacao
+from instrumentacao import etapa
+from preparar_dados import PATH_PREPARADO, carregar_preparado
+from predicao import ARQUIVO_GRADE, construir_grade, validar_grade, salvar_grade
+
+COLUNAS = ["Airline", "Distance", "Month"]
+
+# Voos mínimos por classe na subamostra (--amostra) para os splits estratificados
+MINIMO_POR_CLASSE = 10
+
+parser = argparse.ArgumentParser(description='Treina o classificador de atrasos')
+parser.add_argument('--modelo', choices=['rf', 'hist'], default='rf',
+                    help='rf: RandomForest em todos os núcleos; '
+                         'hist: gradient boosting por histogramas, para datasets grandes')
+parser.add_argument('--dados', default=PATH_PREPARADO,
+                    help='dataset preparado de treino; data/amostra_treino.arrow (gerado por '
+                         'amostragem.py) treina numa amostra sem ler o dataset inteiro')
+parser.add_argument('--amostra', type=float, default=None,
+                    help='treina com uma subamostra estratificada: fração (0–1) ou número de voos; '
+                         f'precisa deixar ao menos {MINIMO_POR_CLASSE} voos em cada classe')
+parser.add_argument('--n-jobs', type=int, default=-1,
+                    help='núcleos usados pelo RandomForest (-1 = todos)')
+parser.add_argument('--grade', action='store_true',
+                    help='pré-computa as previsões em uma grade companhia × mês × distância')
+parser.add_argument('--passo-grade', type=float, default=1,
+                    help='resolução da grade de distâncias, em milhas; com 1 toda distância inteira '
+                         'está na grade, com passos maiores as distâncias entre pontos vão ao modelo')
+parser.add_argument('--cobertura-minima', type=float, default=0.9,
+                    help='fração mínima dos voos do dataset respondida pela grade; abaixo disso '
+                         'ela não é salva')
+instrumentacao.adicionar_argumentos(parser)
+args = parser.parse_args()
+if args.amostra is not None and args.amostra <= 0:
+    parser.error('--amostra precisa ser positiva')
+instrumentacao.configurar(args)
+
 os.makedirs("modelo", exist_ok=True)
-df = pd.read_csv("data/dados_agrupamento.csv")
 
-# Criar variável alvo: atraso na chegada > 5 minutos
-df["Atraso"] = (df["ArrDelay"] > 5).astype(int)
+with etapa("carregar", bytes_lidos=instrumentacao.tamanho(args.dados)) as medida:
+    df = carregar_preparado(args.dados)
+    medida['linhas_saida'] = len(df)
+
+with etapa("codificar", linhas_entrada=len(df)) as medida:
+    # Criar variável alvo: atraso na chegada > 5 minutos
+    y = (df["ArrDelay"] > 5).astype("int8")
+
+    # Selecionar features preditoras
+    X = df[COLUNAS].copy()
 
-# Selecionar features preditoras 
-X = df[["Airline", "Distance", "Month"]].copy()
-y = df["Atraso"]
+    # Codificar variável categórica direto pelos códigos da categórica,
+    # sem converter milhões de strings
+    airline = X["Airline"].cat.remove_unused_categories()
+    le = LabelEncoder().fit(airline.cat.categories)
+    X["Airline"] = le.transform(airline.cat.categories)[airline.cat.codes]
 
-# Codificar variável categórica
-le = LabelEncoder()
-X["Airline"] = le.fit_transform(X["Airline"])
+    # Árvores não dependem da escala das features; o transformador identidade
+    # só mantém o contrato dos artefatos usados por predicao.py
+    scaler = FunctionTransformer().fit(X)
 
-# Escalar os dados
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    # Subamostra estratificada para datasets grandes demais
+    if args.amostra is not None:
+        tamanho = args.amostra if args.amostra < 1 else int(args.amostra)
+        # Cada classe precisa de voos suficientes para os dois splits estratificados
+        fracao = tamanho if tamanho < 1 else tamanho / len(y)
+        minoria = int(fracao * y.value_counts().min())
+        if fracao >= 1:
+            parser.error(f"--amostra {args.amostra:g} não é menor que o dataset ({len(y):,} voos)")
+        if minoria < MINIMO_POR_CLASSE:
+            parser.error(f"--amostra {args.amostra:g} deixa {minoria} voos na classe minoritária "
+                         f"(mínimo {MINIMO_POR_CLASSE}) com {len(y):,} voos no dataset")
+        X, _, y, _ = train_test_split(X, y, train_size=tamanho, random_state=42, stratify=y)
 
-# Split treino/teste
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y, test_size=0.3, random_state=42, stratify=y
-)
+    # Split treino/teste
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.3, random_state=42, stratify=y
+    )
+    medida['linhas_saida'] = len(X_train)
 
-# Treinamento do modelo
-clf = RandomForestClassifier(n_estimators=100, random_state=42, class_weight="balanced")
-clf.fit(X_train, y_train)
+with etapa("treinar", linhas_entrada=len(X_train)):
+    if args.modelo == "hist":
+        clf = HistGradientBoostingClassifier(categorical_features=[0], class_weight="balanced", random_state=42)
+    else:
+        clf = RandomForestClassifier(n_estimators=100, random_state=42, class_weight="balanced",
+                                     n_jobs=args.n_jobs)
+    clf.fit(X_train, y_train)
+
+with etapa("avaliar", linhas_entrada=len(X_test)):
+    y_pred = clf.predict(X_test)
 
-# Avaliação do modelo 
-y_pred = clf.predict(X_test)
 print("\n📊 Relatório de Classificação:")
 print(classification_report(y_test, y_pred))
 
@@ -42,6 +102,29 @@ print(classification_report(y_test, y_pred))
 joblib.dump(clf, "modelo/classificador_voos.pkl")
 joblib.dump(scaler, "modelo/scaler_classificacao.pkl")
 joblib.dump(le, "modelo/encoder_airline_classificacao.pkl")
-joblib.dump(["Airline", "Distance", "Month"], "modelo/colunas_usadas.pkl")
+joblib.dump(COLUNAS, "modelo/colunas_usadas.pkl")
 
 print("\n✅ Modelo de classificação treinado e salvo com sucesso!")
+
+# --- Grade de previsões ---
+# Uma grade antiga não corresponde mais ao modelo novo
+path_grade = os.path.join("modelo", ARQUIVO_GRADE)
+if os.path.exists(path_grade):
+    os.remove(path_grade)
+
+if args.grade:
+    with etapa("grade"):
+        artefatos = {"modelo": clf, "scaler": scaler, "encoder": le, "colunas": COLUNAS}
+        grade = construir_grade(artefatos, passo=args.passo_grade)
+        validacao = validar_grade(grade, artefatos, df[COLUNAS])
+        print(f"\n📐 Grade {grade['atraso'].shape}: responde {validacao['cobertura']:.2%} dos voos, "
+              f"erro máximo de probabilidade {validacao['erro_prob_max']:.3f}")
+
+        if validacao['cobertura'] < args.cobertura_minima:
+            print(f"⚠️ Cobertura abaixo de {args.cobertura_minima:.2%}; grade não salva "
+                  f"(use um --passo-grade menor).")
+        else:
+            salvar_grade(grade, path_grade)
+            print(f"✅ Grade salva em '{path_grade}'")
+
+instrumentacao.relatorio(args.relatorio)
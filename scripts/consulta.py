@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from voos import carregar_voos, filtros_voos
+
+# Camada de consulta em nível de voo para filtros ad hoc do app. Cada coluna é um
+# .npy sem compressão (mapeado em memória pelo app) e cada coluna de COLUNAS_INDICE
+# tem um índice invertido: `ordem` são as linhas ordenadas pelo código do valor e as
+# linhas com o código c são ordem[inicio[c]:inicio[c + 1]], já em ordem crescente.
+PASTA_CONSULTA = "data/consulta"
+
+COLUNAS_INDICE = ["Airline", "Month", "DayOfWeek", "OriginCityName", "DestCityName"]
+COLUNAS_VALOR = ["ArrDelay", "Distance", "Cancelled"]
+
+
+def _codigos(serie):
+    '''Códigos inteiros e valores de cada código. Categóricas usam os próprios
+    códigos; inteiros (mês, dia da semana) são o próprio código.'''
+    if hasattr(serie, 'cat'):
+        return serie.cat.codes.to_numpy(), [str(valor) for valor in serie.cat.categories]
+    codigos = serie.to_numpy()
+    return codigos, list(range(int(codigos.max()) + 1))
+
+
+def indexar(codigos, n_valores):
+    '''Índice invertido (ordem, inicio) de uma coluna de códigos'''
+    ordem = np.argsort(codigos, kind='stable').astype('int32')
+    inicio = np.searchsorted(codigos[ordem], np.arange(n_valores + 1)).astype('int64')
+    return ordem, inicio
+
+
+def construir_consulta(df, pasta=PASTA_CONSULTA):
+    '''Grava as colunas e os índices de `df` em `pasta`'''
+    os.makedirs(pasta, exist_ok=True)
+    categorias = {}
+    for col in COLUNAS_INDICE:
+        codigos, categorias[col] = _codigos(df[col])
+        codigos = codigos.astype('int16')
+        ordem, inicio = indexar(codigos, len(categorias[col]))
+        np.save(os.path.join(pasta, f'{col}.npy'), codigos)
+        np.save(os.path.join(pasta, f'{col}_ordem.npy'), ordem)
+        np.save(os.path.join(pasta, f'{col}_inicio.npy'), inicio)
+    for col in COLUNAS_VALOR:
+        np.save(os.path.join(pasta, f'{col}.npy'), df[col].to_numpy())
+    with open(os.path.join(pasta, 'categorias.json'), 'w', encoding='utf-8') as f:
+        json.dump(categorias, f, ensure_ascii=False)
+
+
+def carregar_consulta(pasta=PASTA_CONSULTA):
+    '''Colunas e índices mapeados em memória: nada é lido até ser consultado'''
+    with open(os.path.join(pasta, 'categorias.json'), encoding='utf-8') as f:
+        categorias = json.load(f)
+    carregar = lambda nome: np.load(os.path.join(pasta, f'{nome}.npy'), mmap_mode='r')
+    return {
+        'categorias': categorias,
+        'colunas': {col: carregar(col) for col in COLUNAS_INDICE + COLUNAS_VALOR},
+        'indices': {col: (carregar(f'{col}_ordem'), carregar(f'{col}_inicio')) for col in COLUNAS_INDICE},
+        'n': len(carregar(COLUNAS_VALOR[0])),
+    }
+
+
+def versao_consulta(pasta=PASTA_CONSULTA):
+    '''mtime das categorias, gravadas por último; muda a cada `construir_consulta`'''
+    path = os.path.join(pasta, 'categorias.json')
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def linhas(consulta, filtros):
+    '''Linhas (em ordem crescente) que passam em todos os `filtros` {coluna: [valores]}.
+    Cada filtro é a união das listas do índice; os filtros são intersectados a partir
+    do mais seletivo, sem ler as colunas. Retorna None se não há filtro.'''
+    candidatas = []
+    for col, valores in filtros.items():
+        if not valores:
+            continue
+        ordem, inicio = consulta['indices'][col]
+        posicao = {valor: codigo for codigo, valor in enumerate(consulta['categorias'][col])}
+        codigos = [posicao[valor] for valor in valores if valor in posicao]
+        fatias = [ordem[inicio[c]:inicio[c + 1]] for c in codigos]
+        candidatas.append(np.sort(np.concatenate(fatias)) if len(fatias) > 1
+                          else np.asarray(fatias[0]) if fatias else np.empty(0, 'int32'))
+    if not candidatas:
+        return None
+
+    candidatas.sort(key=len)
+    resultado = candidatas[0]
+    marcadas = np.zeros(consulta['n'], dtype=bool)
+    for outra in candidatas[1:]:
+        marcadas[outra] = True
+        resultado = resultado[marcadas[resultado]]
+        marcadas[outra] = False
+    return resultado
+
+
+def _valores(consulta, col, selecao):
+    coluna = consulta['colunas'][col]
+    return np.asarray(coluna) if selecao is None else coluna[selecao]
+
+
+def resumo(consulta, selecao):
+    '''Métricas dos voos selecionados; só as linhas selecionadas são lidas'''
+    atraso = _valores(consulta, 'ArrDelay', selecao).astype('float64')
+    cancelados = _valores(consulta, 'Cancelled', selecao)
+    atraso = atraso[~np.isnan(atraso)]
+    p50, p90 = np.percentile(atraso, [50, 90]) if len(atraso) else (np.nan, np.nan)
+    return {
+        'NumVoos': len(cancelados),
+        'Cancelados': int(cancelados.sum()),
+        'AtrasoMedio': atraso.mean() if len(atraso) else np.nan,
+        'P50': p50,
+        'P90': p90,
+        'DistanciaMedia': _valores(consulta, 'Distance', selecao).astype('float64').mean(),
+    }
+
+
+def quebra(consulta, selecao, por):
+    '''Voos, cancelados e atraso médio dos voos selecionados por valor de `por`,
+    contados com bincount sobre os códigos das linhas selecionadas'''
+    codigos = _valores(consulta, por, selecao).astype('int64')
+    atraso = _valores(consulta, 'ArrDelay', selecao).astype('float64')
+    cancelados = _valores(consulta, 'Cancelled', selecao).astype('float64')
+    # código -1: valor ausente
+    com_valor = codigos >= 0
+    codigos, atraso, cancelados = codigos[com_valor], atraso[com_valor], cancelados[com_valor]
+    valido = ~np.isnan(atraso)
+    n = len(consulta['categorias'][por])
+    tabela = pd.DataFrame({
+        por: consulta['categorias'][por],
+        'NumVoos': np.bincount(codigos, minlength=n),
+        'Cancelados': np.bincount(codigos, weights=cancelados, minlength=n).astype('int64'),
+        'SomaAtraso': np.bincount(codigos[valido], weights=atraso[valido], minlength=n),
+        'NumAtraso': np.bincount(codigos[valido], minlength=n),
+    })
+    tabela = tabela[tabela['NumVoos'] > 0]
+    tabela = tabela.assign(AtrasoMedio=tabela['SomaAtraso'] / tabela['NumAtraso'])
+    return tabela.drop(columns=['SomaAtraso', 'NumAtraso']).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera a camada de consulta ad hoc do app em data/consulta/')
+    parser.add_argument('--anos', type=int, nargs='+', help='só voos destes anos')
+    parser.add_argument('--meses', type=int, nargs='+', help='só voos destes meses')
+    parser.add_argument('--companhias', nargs='+', help='só voos destas companhias')
+    args = parser.parse_args()
+
+    df = carregar_voos("data/reduced", columns=COLUNAS_INDICE + COLUNAS_VALOR,
+                       filtros=filtros_voos(args.anos, args.meses, args.companhias))
+    construir_consulta(df)
+
+    print(f"✅ Consulta com {len(df):,} voos salva em '{PASTA_CONSULTA}'")
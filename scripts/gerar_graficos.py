@@ -0,0 +1,40 @@
+import argparse
+
+import instrumentacao
+from graficos import GRAFICOS, construir_graficos
+
+datapath = '../data/'
+tablespath = '../tables/'
+raiz = '../'
+
+# O guard é necessário para o pool de processos em plataformas sem fork (Windows/macOS)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera os gráficos estáticos de plots/ '
+                                                 'a partir das tabelas de tables/')
+    parser.add_argument('graficos', nargs='*', metavar='GRAFICO',
+                        help='só estes gráficos (padrão: todos), ex.: plots/atrasos_mensais.png')
+    parser.add_argument('--forcar', action='store_true',
+                        help='redesenha todos os gráficos, ignorando o cache')
+    parser.add_argument('--processos', type=int, default=None,
+                        help='gráficos desenhados em paralelo (padrão: um processo por núcleo)')
+    instrumentacao.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacao.configurar(args)
+    desconhecidos = [nome for nome in args.graficos if nome not in GRAFICOS]
+    if desconhecidos:
+        parser.error(f"gráficos desconhecidos: {', '.join(desconhecidos)} (opções: {', '.join(GRAFICOS)})")
+
+    # Só redesenha os gráficos cuja tabela ou código mudou (ver data/cache/manifesto_graficos.json)
+    redesenhados, sem_tabela = construir_graficos(tablespath, raiz, cachepath=datapath + 'cache/',
+                                                  nomes=args.graficos or None, forcar=args.forcar,
+                                                  processos=args.processos)
+
+    if sem_tabela:
+        print(f"⚠️ {len(sem_tabela)} gráficos sem tabela em {tablespath} (rode gerar_tabelas.py): "
+              f"{', '.join(sorted(sem_tabela))}")
+    if redesenhados:
+        print(f"✅ {len(redesenhados)} gráficos redesenhados: {', '.join(sorted(redesenhados))}")
+    else:
+        print("✅ Gráficos já atualizados")
+
+    instrumentacao.relatorio(args.relatorio)
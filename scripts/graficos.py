@@ -0,0 +1,271 @@
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.ticker as mtick
+import pandas as pd
+from matplotlib.figure import Figure
+
+import instrumentacao
+from instrumentacao import etapa, tamanho
+from tabelas import _hash, hash_arquivo, hash_codigo
+
+# Gráficos estáticos de plots/, desenhados a partir das tabelas de tables/
+# (nunca dos voos). Cada gráfico só é redesenhado quando o conteúdo de uma das suas
+# tabelas ou o código que o desenha muda. As figuras são `matplotlib.figure.Figure`
+# avulsas, sem pyplot: nada abre janela e os processos do pool não dividem estado.
+# Os dendrogramas de graficos/ vêm só do agrupamento_modelo.py, junto com os grupos.
+ARQUIVO_MANIFESTO = 'manifesto_graficos.json'
+DPI = 300
+
+# Gráfico: tabelas lidas (caminhos relativos a tables/), a função que desenha, chamada
+# com a figura e um DataFrame por tabela, na mesma ordem, e o tamanho da figura em polegadas
+Grafico = namedtuple('Grafico', ['tabelas', 'desenhar', 'tamanho'], defaults=[(12, 6)])
+
+
+def _barras_companhias(ax, nomes, valores, cor, xlabel):
+    ax.barh(nomes, valores, color=cor)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Companhia Aérea')
+    ax.grid(axis='x', linestyle='--', alpha=0.6)
+
+
+def _mensal(cubo, chaves):
+    '''Voos e atraso médio do cubo temporal somados até `chaves`'''
+    out = cubo.groupby(chaves, observed=True)[['NumVoos', 'SomaAtraso', 'NumAtraso']].sum()
+    out['AtrasoMedio'] = out['SomaAtraso'] / out['NumAtraso']
+    return out
+
+
+def _top5_por_mes(fig, por_mes, coluna, titulo):
+    '''Uma grade 4 × 3 com as 5 maiores companhias de cada mês em `coluna`'''
+    axs = fig.subplots(4, 3, sharex=True)
+    for mes in range(1, 13):
+        ax = axs[(mes - 1) // 3, (mes - 1) % 3]
+        ax.set_title(mes)
+        if mes in por_mes.index.get_level_values('Month'):
+            top = por_mes.xs(mes, level='Month')[coluna].dropna().sort_values().tail(5)
+            ax.barh(top.index.astype(str), top.values)
+    fig.suptitle(titulo)
+    fig.tight_layout()
+
+
+def desenhar_atraso_por_companhia(fig, voos_delay):
+    df = voos_delay.sort_values('AtrasoMedio', ascending=False)
+    ax = fig.subplots()
+    _barras_companhias(ax, df['Airline'], df['AtrasoMedio'], 'cornflowerblue', 'Atraso Médio na Chegada (minutos)')
+    ax.set_title('Atraso Médio por Companhia Aérea')
+
+
+def desenhar_total_voos_companhia(fig, voos_por_companhia):
+    df = voos_por_companhia.sort_values('TotalVoos', ascending=False)
+    ax = fig.subplots()
+    _barras_companhias(ax, df['Airline'], df['TotalVoos'], 'mediumseagreen', 'Total de Voos')
+    ax.set_title('Total de Voos por Companhia Aérea')
+    ax.invert_yaxis()
+
+
+def desenhar_voos_atraso_companhias(fig, voos_delay):
+    ax = fig.subplots()
+    ax.scatter(voos_delay['NumVoos'], voos_delay['AtrasoMedio'], color='seagreen', s=100)
+    for _, linha in voos_delay.iterrows():
+        ax.text(linha['NumVoos'] * 1.01, linha['AtrasoMedio'], linha['Airline'], fontsize=9)
+    ax.xaxis.set_major_formatter(mtick.ScalarFormatter(useMathText=True))
+    ax.ticklabel_format(style='sci', axis='x', scilimits=(0, 0))
+    ax.set_xlabel('Total de Voos', fontsize=12)
+    ax.set_ylabel('Atraso Médio na Chegada (min)', fontsize=12)
+    ax.set_title('Total de Voos vs Atraso Médio por Companhia', fontsize=14)
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+
+def desenhar_distancia_companhias(fig, perfis):
+    df = perfis.sort_values('DistanciaMedia', ascending=False)
+    ax = fig.subplots()
+    _barras_companhias(ax, df['Airline'], df['DistanciaMedia'], 'darkorange', 'Distância Média (milhas)')
+    ax.set_title('Distância Média Voada por Companhia Aérea')
+    ax.invert_yaxis()
+
+
+def desenhar_top10_cidades_atraso(fig, atrasos_por_cidade):
+    top = atrasos_por_cidade.nlargest(10, 'NumVoos')
+    ax = fig.subplots()
+    ax.scatter(top['NumVoos'], top['AtrasoMedio'], color='mediumseagreen', s=100)
+    for _, linha in top.iterrows():
+        ax.text(linha['NumVoos'], linha['AtrasoMedio'] + 0.2, linha['DestCityName'], fontsize=9, ha='center')
+    ax.set_xlabel('Total de Voos')
+    ax.set_ylabel('Atraso Médio na Chegada (minutos)')
+    ax.set_title('Cidades com Maior Número de Voos x Atraso Médio')
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+
+def desenhar_top10_cidades_voos_atraso(fig, atrasos_por_cidade):
+    top = atrasos_por_cidade.nlargest(10, 'NumVoos')
+    ax = fig.subplots()
+    ax.bar(top['DestCityName'], top['NumVoos'], color='skyblue')
+    ax.set_ylabel('Total de Voos', color='blue')
+    ax.tick_params(axis='y', labelcolor='blue')
+    ax.tick_params(axis='x', rotation=45)
+    for rotulo in ax.get_xticklabels():
+        rotulo.set_horizontalalignment('right')
+    direita = ax.twinx()
+    direita.plot(top['DestCityName'], top['AtrasoMedio'], color='tomato', marker='o', linewidth=2)
+    direita.set_ylabel('Atraso Médio na Chegada (min)', color='tomato')
+    direita.tick_params(axis='y', labelcolor='tomato')
+    direita.grid(axis='y', linestyle='--', alpha=0.6)
+    ax.set_title('Top 10 Cidades por Número de Voos e seu Atraso Médio')
+
+
+def desenhar_atraso_por_faixa(fig, atrasos_por_faixa):
+    ax = fig.subplots()
+    ax.bar(atrasos_por_faixa['FaixaDistancia'], atrasos_por_faixa['ArrDelay'], color='steelblue')
+    ax.set_xlabel('Faixa de Distância (milhas)')
+    ax.set_ylabel('Atraso Médio na Chegada (minutos)')
+    ax.set_title('Atraso Médio na Chegada por Faixa de Distância')
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+
+
+def desenhar_atraso_por_horario(fig, cubo):
+    por_hora = _mensal(cubo, ['HourBlock'])
+    ax = fig.subplots()
+    ax.bar(por_hora.index.astype(str), por_hora['AtrasoMedio'], color='skyblue')
+    ax.set_title('Média de Atraso na Chegada por Hora', fontsize=14)
+    ax.set_xlabel('Hora da Chegada')
+    ax.set_ylabel('Atraso Médio (minutos)')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+
+def desenhar_atrasos_mensais(fig, cubo):
+    por_mes = _mensal(cubo, ['Month'])
+    ax = fig.subplots()
+    ax.bar(por_mes.index.astype(str), por_mes['AtrasoMedio'])
+    ax.set_title('Média mensal de atrasos')
+    ax.set_xlabel('Mês')
+    ax.set_ylabel('Atraso Médio (Minutos)')
+
+
+def desenhar_voos_companhias_meses(fig, cubo):
+    _top5_por_mes(fig, _mensal(cubo, ['Airline', 'Month']), 'NumVoos',
+                  'Números de voos das 5 maiores linhas aéreas ao longo dos meses')
+
+
+def desenhar_atrasos_companhias_meses(fig, cubo):
+    _top5_por_mes(fig, _mensal(cubo, ['Airline', 'Month']), 'AtrasoMedio',
+                  'Linhas áreas com maiores atrasos ao longo dos meses')
+
+
+def desenhar_cancelamentos(fig, cancel_counts):
+    ax = fig.subplots()
+    ax.barh(cancel_counts['Airline'], cancel_counts['VoosCanceladosPct'])
+    ax.set_xlim(0, max(4, cancel_counts['VoosCanceladosPct'].max() * 1.05))
+    ax.set_title('Voos cancelados a cada 100 voos, por linha aérea')
+
+
+# saída (relativa à raiz do projeto): Grafico
+GRAFICOS = {
+    'plots/atraso_por_companhia_2019.png':
+        Grafico(['voos_delay.csv'], desenhar_atraso_por_companhia, (14, 6)),
+    'plots/total_voo_companhia_2019.png':
+        Grafico(['voos_por_companhia.csv'], desenhar_total_voos_companhia, (14, 6)),
+    'plots/Voos_Atraso_medio_Companhias_2019.png':
+        Grafico(['voos_delay.csv'], desenhar_voos_atraso_companhias),
+    'plots/Distancia_Companhias_2019.png':
+        Grafico(['perfis_companhias.csv'], desenhar_distancia_companhias),
+    'plots/top10_cidades_atraso_2019.png':
+        Grafico(['atrasos_por_cidade.csv'], desenhar_top10_cidades_atraso, (10, 6)),
+    'plots/Top10_cidades_atraso_medio_2019.png':
+        Grafico(['atrasos_por_cidade.csv'], desenhar_top10_cidades_voos_atraso),
+    'plots/Atraso_medio_chegada_distancia_2019.png':
+        Grafico(['atrasos_por_faixa.csv'], desenhar_atraso_por_faixa),
+    'plots/media_atraso_horario_2019.png':
+        Grafico(['cubo_temporal.parquet'], desenhar_atraso_por_horario),
+    'plots/atrasos_mensais.png':
+        Grafico(['cubo_temporal.parquet'], desenhar_atrasos_mensais),
+    'plots/voos_companhias_meses.png':
+        Grafico(['cubo_temporal.parquet'], desenhar_voos_companhias_meses, (15, 8)),
+    'plots/atrasos_companhias_meses.png':
+        Grafico(['cubo_temporal.parquet'], desenhar_atrasos_companhias_meses, (20, 8)),
+    'plots/cancelamento_companhias.png':
+        Grafico(['cancel_counts.csv'], desenhar_cancelamentos),
+}
+
+
+def _ler_tabela(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+def renderizar(nome, tablespath, raiz):
+    '''Desenha um gráfico e grava o PNG. Roda num processo do pool; retorna os
+    registros de etapas desta tarefa.'''
+    inicio = len(instrumentacao.registros())
+    grafico = GRAFICOS[nome]
+    paths = [tablespath + tabela for tabela in grafico.tabelas]
+    saida = os.path.join(raiz, nome)
+    with etapa(f'renderizar:{nome}', bytes_lidos=tamanho(*paths)) as medida:
+        fig = Figure(figsize=grafico.tamanho)
+        grafico.desenhar(fig, *map(_ler_tabela, paths))
+        os.makedirs(os.path.dirname(saida), exist_ok=True)
+        # grava num temporário e renomeia: um PNG nunca fica pela metade
+        temporario = saida + '.tmp.png'
+        fig.savefig(temporario, dpi=DPI, bbox_inches='tight')
+        os.replace(temporario, saida)
+        medida['bytes_escritos'] = tamanho(saida)
+    return instrumentacao.registros()[inicio:]
+
+
+def carregar_manifesto(cachepath):
+    path = cachepath + ARQUIVO_MANIFESTO
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'tabelas': {}, 'graficos': {}}
+
+
+def salvar_manifesto(manifesto, cachepath):
+    os.makedirs(cachepath, exist_ok=True)
+    with open(cachepath + ARQUIVO_MANIFESTO, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+
+
+def construir_graficos(tablespath, raiz, cachepath, nomes=None, forcar=False, processos=None):
+    '''Redesenha só os gráficos cuja tabela de origem ou código de desenho mudou desde
+    o último build, em `processos` processos (padrão: um por núcleo). Gráficos cujas
+    tabelas ainda não existem são pulados. Retorna (redesenhados, sem tabela).'''
+    manifesto = carregar_manifesto(cachepath)
+    nomes = list(GRAFICOS) if nomes is None else nomes
+    tabelas = sorted({tabela for nome in nomes for tabela in GRAFICOS[nome].tabelas})
+
+    with etapa('hash das tabelas', bytes_lidos=tamanho(*(tablespath + tabela for tabela in tabelas))):
+        registros = {}
+        for tabela in tabelas:
+            if os.path.exists(tablespath + tabela):
+                registros[tabela] = hash_arquivo(tablespath + tabela, manifesto['tabelas'].get(tabela))
+    manifesto['tabelas'].update(registros)
+
+    sem_tabela = [nome for nome in nomes if not all(tabela in registros for tabela in GRAFICOS[nome].tabelas)]
+    chaves = {
+        nome: _hash(*(registros[tabela]['sha256'] for tabela in GRAFICOS[nome].tabelas),
+                    hash_codigo(GRAFICOS[nome].desenhar), GRAFICOS[nome].tamanho, DPI)
+        for nome in nomes if nome not in sem_tabela
+    }
+    pendentes = [nome for nome in chaves
+                 if forcar
+                 or manifesto['graficos'].get(nome) != chaves[nome]
+                 or not os.path.exists(os.path.join(raiz, nome))]
+
+    with etapa('renderizar'):
+        if len(pendentes) == 1 or processos == 1:
+            for nome in pendentes:
+                renderizar(nome, tablespath, raiz)
+                manifesto['graficos'][nome] = chaves[nome]
+        elif pendentes:
+            with ProcessPoolExecutor(min(processos or os.cpu_count(), len(pendentes)),
+                                     initializer=instrumentacao.configurar_processo,
+                                     initargs=(instrumentacao.configuracao(),)) as pool:
+                futuros = {nome: pool.submit(renderizar, nome, tablespath, raiz) for nome in pendentes}
+            for nome, futuro in futuros.items():
+                instrumentacao.registrar(futuro.result())
+                manifesto['graficos'][nome] = chaves[nome]
+
+    salvar_manifesto(manifesto, cachepath)
+    return pendentes, sem_tabela
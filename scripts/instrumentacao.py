@@ -0,0 +1,191 @@
+import cProfile
+import datetime
+import fnmatch
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Instrumentação comum dos scripts do pipeline: cada etapa registra tempo de parede e
+# de CPU, linhas de entrada/saída, bytes lidos/escritos e pico de memória. Ao fim do
+# script, `relatorio()` imprime a tabela-resumo e, com --relatorio, grava o JSON.
+#
+# Pico de memória: no Linux, cada etapa de nível mais alto zera o pico do processo
+# (VmHWM) ao começar, então o valor é o pico daquela etapa. Etapas aninhadas ou em
+# threads reportam o pico desde o início da etapa de fora que as contém. Fora do
+# Linux é o pico do processo até o fim da etapa.
+
+MEDIDAS = ['linhas_entrada', 'linhas_saida', 'bytes_lidos', 'bytes_escritos']
+
+_registros = []
+_pilha_principal = []
+_local = threading.local()
+_config = {'perfil': None, 'pasta_perfil': '.'}
+# Só um cProfile pode estar ativo por vez (no Python 3.12+ um segundo enable() falha):
+# uma etapa aninhada ou em outra thread já é coberta ou fica sem perfil
+_perfilando = threading.Lock()
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--relatorio', metavar='JSON',
+                        help='grava o relatório de etapas (tempo, linhas, bytes, memória) neste arquivo')
+    parser.add_argument('--perfil', metavar='ETAPA',
+                        help='roda o cProfile na etapa com este nome, ex.: "escrever:comps" (aceita curingas; '
+                             'enquanto uma etapa é perfilada, as demais que casam ficam sem perfil)')
+
+
+def configurar(args):
+    _config['perfil'] = args.perfil
+    if args.relatorio:
+        _config['pasta_perfil'] = os.path.dirname(os.path.abspath(args.relatorio))
+
+
+def configuracao():
+    return dict(_config)
+
+
+def configurar_processo(config):
+    '''Initializer de pools de processos: repassa --perfil aos processos filhos. Com fork,
+    o filho herda as etapas abertas, os registros e o perfil ativo do pai, que não são dele.'''
+    global _perfilando
+    _config.update(config)
+    _pilha_principal.clear()
+    _registros.clear()
+    _perfilando = threading.Lock()
+
+
+def _pico_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def _zerar_pico():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def tamanho(*paths):
+    '''Bytes ocupados por arquivos ou diretórios (recursivamente)'''
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(raiz, arquivo))
+                         for raiz, _, arquivos in os.walk(path) for arquivo in arquivos)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+@contextmanager
+def etapa(nome, **medidas):
+    '''Mede o bloco como a etapa `nome`. O dicionário devolvido aceita as medidas
+    de MEDIDAS, preenchidas dentro do bloco ou passadas como argumentos.'''
+    # etapas em threads (ex.: saídas escritas em paralelo) ficam aninhadas na etapa
+    # corrente da thread principal
+    principal = threading.current_thread() is threading.main_thread()
+    if principal:
+        pilha, nivel = _pilha_principal, len(_pilha_principal)
+        if not pilha:
+            _zerar_pico()
+    else:
+        pilha = _local.__dict__.setdefault('pilha', [])
+        nivel = len(_pilha_principal) + len(pilha)
+    registro = {'etapa': nome, 'nivel': nivel, **medidas}
+    _registros.append(registro)  # na ordem em que as etapas começam
+    pilha.append(nome)
+
+    perfil = None
+    if (_config['perfil'] and fnmatch.fnmatchcase(nome, _config['perfil'])
+            and _perfilando.acquire(blocking=False)):
+        perfil = cProfile.Profile()
+        perfil.enable()
+    # fora da thread principal, só o CPU da própria thread (o do processo inclui as vizinhas)
+    relogio_cpu = time.process_time if principal else time.thread_time
+    inicio, cpu = time.perf_counter(), relogio_cpu()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = time.perf_counter() - inicio
+        registro['cpu_segundos'] = relogio_cpu() - cpu
+        registro['pico_mb'] = _pico_mb()
+        for chave in MEDIDAS:
+            if registro.get(chave) is not None:
+                registro[chave] = int(registro[chave])
+        etapas = list(pilha) if principal else _pilha_principal + pilha
+        pilha.pop()
+        if perfil is not None:
+            perfil.disable()
+            _perfilando.release()
+            registro['perfil'] = _salvar_perfil(perfil, nome, etapas)
+
+
+def _salvar_perfil(perfil, nome, etapas):
+    '''Grava o perfil com o nome de todas as etapas abertas (`etapas`, da mais externa
+    até esta): a mesma etapa em tarefas diferentes, ex.: "calcular:*" dentro de cada
+    "parcial:Year=…/Month=…/…", não sobrescreve o arquivo das outras'''
+    os.makedirs(_config['pasta_perfil'], exist_ok=True)
+    arquivo = '__'.join(etapa.replace(':', '_').replace('/', '_') for etapa in etapas)
+    path = os.path.join(_config['pasta_perfil'], f"perfil_{arquivo}.prof")
+    perfil.dump_stats(path)
+    print(f"\n🔬 Perfil da etapa '{nome}' (abra com snakeviz ou pstats: {path}):")
+    pstats.Stats(perfil).sort_stats('cumulative').print_stats(15)
+    return path
+
+
+def registrar(registros):
+    '''Acrescenta registros de etapas medidas em outro processo (ex.: pool de processos),
+    aninhados na etapa corrente'''
+    _registros.extend({**registro, 'nivel': registro['nivel'] + len(_pilha_principal)} for registro in registros)
+
+
+def registros():
+    return list(_registros)
+
+
+def _formatar(valor, formato):
+    return '-' if valor is None else format(valor, formato)
+
+
+def relatorio(path=None):
+    '''Imprime a tabela-resumo das etapas e, se `path` for dado, grava o JSON'''
+    print(f"\n{'etapa':<50}{'s':>9}{'cpu s':>9}{'linhas in':>13}{'linhas out':>13}"
+          f"{'MB lidos':>10}{'MB escritos':>12}{'pico MB':>9}")
+    for registro in _registros:
+        mb = lambda chave: registro[chave] / 2**20 if registro.get(chave) is not None else None
+        print(f"{'  ' * registro['nivel'] + registro['etapa']:<50}"
+              f"{registro['segundos']:>9.2f}{registro['cpu_segundos']:>9.2f}"
+              f"{_formatar(registro.get('linhas_entrada'), ',d'):>13}"
+              f"{_formatar(registro.get('linhas_saida'), ',d'):>13}"
+              f"{_formatar(mb('bytes_lidos'), ',.1f'):>10}{_formatar(mb('bytes_escritos'), ',.1f'):>12}"
+              f"{_formatar(registro['pico_mb'], ',.0f'):>9}")
+
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'script': os.path.basename(sys.argv[0]),
+                'argumentos': sys.argv[1:],
+                'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                'etapas': _registros,
+            }, f, ensure_ascii=False, indent=1)
+        print(f"📝 Relatório salvo em '{path}'")
@@ -0,0 +1,41 @@
+import glob
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Todas as tabelas do dashboard num único arquivo Arrow IPC sem compressão: uma linha
+# por tabela, com o nome (caminho relativo a tables/) e a tabela serializada em IPC.
+# O app mapeia o arquivo em memória e lê tudo de uma vez, sem parsear CSV.
+ARQUIVO_PACOTE = 'tabelas.arrow'
+
+
+def _serializar(df):
+    sink = pa.BufferOutputStream()
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_file(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().to_pybytes()
+
+
+def escrever_pacote(outpath):
+    '''Empacota os CSVs de `outpath` (e de `outpath/comps/`). As tabelas são relidas
+    dos próprios CSVs, então o app vê exatamente as mesmas colunas e tipos.'''
+    arquivos = sorted(glob.glob(outpath + '*.csv') + glob.glob(outpath + 'comps/*.csv'))
+    nomes = [os.path.relpath(arquivo, outpath).replace(os.sep, '/') for arquivo in arquivos]
+    dados = [_serializar(pd.read_csv(arquivo)) for arquivo in arquivos]
+    pacote = pa.table({'nome': nomes, 'dados': pa.array(dados, type=pa.large_binary())})
+    # escreve num temporário e renomeia: o app nunca vê um pacote pela metade
+    temporario = outpath + ARQUIVO_PACOTE + '.tmp'
+    feather.write_feather(pacote, temporario, compression='uncompressed')
+    os.replace(temporario, outpath + ARQUIVO_PACOTE)
+
+
+def ler_pacote(path):
+    '''Dicionário nome → DataFrame com todas as tabelas do pacote'''
+    pacote = feather.read_table(path, memory_map=True)
+    tabelas = {}
+    for nome, dados in zip(pacote['nome'].to_pylist(), pacote['dados']):
+        tabelas[nome] = pa.ipc.open_file(dados.as_buffer()).read_all().to_pandas()
+    return tabelas
@@ -0,0 +1,150 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+PASTA_MODELO = os.path.join(os.path.dirname(__file__), '..', 'modelo')
+
+ARQUIVOS = {
+    'modelo': 'classificador_voos.pkl',
+    'scaler': 'scaler_classificacao.pkl',
+    'encoder': 'encoder_airline_classificacao.pkl',
+    'colunas': 'colunas_usadas.pkl',
+}
+
+# grade pré-computada de previsões (opcional, gerada por classificacao_modelo.py --grade)
+ARQUIVO_GRADE = 'grade_previsoes.npz'
+
+MESES = np.arange(1, 13)
+
+
+def versao_artefatos(pasta=PASTA_MODELO):
+    '''mtimes dos artefatos; muda sempre que o modelo é re-treinado'''
+    arquivos = [*ARQUIVOS.values(), ARQUIVO_GRADE]
+    return tuple(os.path.getmtime(os.path.join(pasta, arquivo))
+                 for arquivo in arquivos if os.path.exists(os.path.join(pasta, arquivo)))
+
+
+def carregar_artefatos(pasta=PASTA_MODELO):
+    artefatos = {nome: joblib.load(os.path.join(pasta, arquivo)) for nome, arquivo in ARQUIVOS.items()}
+    if os.path.exists(os.path.join(pasta, ARQUIVO_GRADE)):
+        artefatos['grade'] = carregar_grade(os.path.join(pasta, ARQUIVO_GRADE))
+    return artefatos
+
+
+def _prever_modelo(artefatos, dados, tamanho_lote):
+    '''Previsão pelo RandomForest; `dados` só com companhias conhecidas'''
+    modelo, scaler, encoder = artefatos['modelo'], artefatos['scaler'], artefatos['encoder']
+
+    X = dados[artefatos['colunas']].copy()
+    X['Airline'] = encoder.transform(X['Airline'])
+    X = scaler.transform(X)
+
+    atraso = np.empty(len(X))
+    prob = np.empty(len(X))
+    idx_atraso = list(modelo.classes_).index(1)
+    for inicio in range(0, len(X), tamanho_lote):
+        proba = modelo.predict_proba(X[inicio:inicio + tamanho_lote])
+        atraso[inicio:inicio + tamanho_lote] = modelo.classes_[proba.argmax(axis=1)]
+        prob[inicio:inicio + tamanho_lote] = proba[:, idx_atraso]
+    return atraso, prob
+
+
+def prever_lote(artefatos, dados, tamanho_lote=100_000, usar_grade=True):
+    '''Classifica um DataFrame de voos (Airline, Distance, Month) em lotes vetorizados.
+
+    Retorna uma cópia de `dados` com as colunas Atraso (1 = atraso previsto) e
+    ProbAtraso. Voos de companhias que o encoder não conhece ficam com NaN. Se houver
+    grade carregada, os voos dentro dela são respondidos por lookup, sem o modelo.'''
+    resultado = dados.copy()
+    resultado['Atraso'] = np.nan
+    resultado['ProbAtraso'] = np.nan
+
+    pendentes = dados['Airline'].isin(artefatos['encoder'].classes_).to_numpy()
+
+    if usar_grade and 'grade' in artefatos:
+        atraso, prob, na_grade = prever_grade(artefatos['grade'], dados)
+        resultado.loc[na_grade, 'Atraso'] = atraso[na_grade]
+        resultado.loc[na_grade, 'ProbAtraso'] = prob[na_grade]
+        pendentes = pendentes & ~na_grade
+
+    if pendentes.any():
+        atraso, prob = _prever_modelo(artefatos, dados.loc[pendentes], tamanho_lote)
+        resultado.loc[pendentes, 'Atraso'] = atraso
+        resultado.loc[pendentes, 'ProbAtraso'] = prob
+    return resultado
+
+
+# --- Grade pré-computada ---
+
+def construir_grade(artefatos, passo=1, inicio=50, fim=5000):
+    '''Pré-computa classe e probabilidade prevista para todas as combinações
+    companhia × mês × distância (de `inicio` a `fim` milhas, a cada `passo`).'''
+    companhias = np.asarray(artefatos['encoder'].classes_, dtype=str)
+    distancias = np.arange(inicio, fim + passo, passo, dtype='float32')
+    distancias = distancias[distancias <= fim]
+
+    comp, mes, dist = np.meshgrid(companhias, MESES, distancias, indexing='ij')
+    combinacoes = pd.DataFrame({'Airline': comp.ravel(), 'Distance': dist.ravel(), 'Month': mes.ravel()})
+    atraso, prob = _prever_modelo(artefatos, combinacoes, tamanho_lote=100_000)
+
+    forma = (len(companhias), len(MESES), len(distancias))
+    return {
+        'companhias': companhias,
+        'distancias': distancias,
+        'atraso': atraso.reshape(forma).astype('int8'),
+        'prob': prob.reshape(forma).astype('float16'),
+    }
+
+
+def prever_grade(grade, dados):
+    '''Lookup O(1) por voo na grade: companhia, mês e distância exatos. Retorna
+    (atraso, prob, na_grade); linhas fora da grade (companhia desconhecida, mês
+    inválido, distância fora do intervalo ou entre dois pontos da grade) ficam NaN e
+    são respondidas pelo modelo, então a grade nunca diverge dele. Com o passo padrão
+    de 1 milha, toda distância inteira do intervalo está na grade.'''
+    distancias = grade['distancias']
+    passo = distancias[1] - distancias[0] if len(distancias) > 1 else 1
+
+    comp = pd.Index(grade['companhias']).get_indexer(dados['Airline'])
+    mes = dados['Month'].to_numpy(dtype='int64') - 1
+    dist = dados['Distance'].to_numpy(dtype='float64')
+    i_dist = np.rint((dist - distancias[0]) / passo)
+
+    na_grade = ((comp >= 0) & (mes >= 0) & (mes < len(MESES))
+                & (i_dist >= 0) & (i_dist < len(distancias)))
+    na_grade[na_grade] = distancias[i_dist[na_grade].astype('int64')] == dist[na_grade]
+
+    atraso = np.full(len(dados), np.nan)
+    prob = np.full(len(dados), np.nan)
+    idx = (comp[na_grade], mes[na_grade], i_dist[na_grade].astype('int64'))
+    atraso[na_grade] = grade['atraso'][idx]
+    prob[na_grade] = grade['prob'][idx]
+    return atraso, prob, na_grade
+
+
+def validar_grade(grade, artefatos, dados, n=20_000, seed=42):
+    '''Confere a grade em até `n` voos sorteados de `dados` (Airline, Distance, Month).
+    Como o lookup é exato, a classe de um voo respondido pela grade é a do modelo; o
+    que varia é quantos voos ela responde (distâncias fora do intervalo ou entre dois
+    pontos da grade vão ao modelo). Retorna essa cobertura e o maior erro absoluto de
+    probabilidade nos voos respondidos (a grade guarda float16).'''
+    amostra = dados.sample(min(n, len(dados)), random_state=seed)
+    _, prob_grade, na_grade = prever_grade(grade, amostra)
+    if not na_grade.any():
+        return {'cobertura': 0.0, 'erro_prob_max': 0.0}
+    _, prob = _prever_modelo(artefatos, amostra[na_grade], tamanho_lote=100_000)
+    return {
+        'cobertura': float(na_grade.mean()),
+        'erro_prob_max': float(np.abs(prob_grade[na_grade] - prob).max()),
+    }
+
+
+def salvar_grade(grade, path):
+    np.savez(path, **grade)
+
+
+def carregar_grade(path):
+    with np.load(path, allow_pickle=False) as arquivo:
+        return {nome: arquivo[nome] for nome in arquivo.files}
@@ -1,26 +1,63 @@
-import pandas as pd
+import argparse
 import os
 
-# --- Carregar dados do Parquet ---
-df = pd.read_parquet("data/reduced_Combined_Flights_2019.parquet")
-
-# --- Selecionar colunas relevantes ---
-colunas_utilizadas = [
-    "Airline",      # Categórica → será codificada depois
-    "Distance",     # Numérica
-    "ArrDelay",     # Numérica
-    "Cancelled",     # Para filtragem
-    "Month" 
-]
-df = df[colunas_utilizadas]
-
-# --- Filtrar voos não cancelados e remover valores ausentes ---
-df = df[df["Cancelled"] == False]
-df = df.drop(columns=["Cancelled"])
-df = df.dropna()
-
-# --- Salvar dataset limpo para o agrupamento ---
-os.makedirs("data", exist_ok=True)
-df.to_csv("data/dados_agrupamento.csv", index=False)
-
-print("✅ Dados preparados com sucesso e salvos em 'data/dados_agrupamento.csv'")
+import pyarrow.feather as feather
+
+import instrumentacao
+from instrumentacao import etapa, tamanho
+from voos import carregar_voos, filtros_voos
+
+# Formato Arrow IPC sem compressão: pode ser mapeado em memória e lido sem cópia
+PATH_PREPARADO = "data/dados_agrupamento.arrow"
+
+# --- Tipos do dataset preparado ---
+tipos = {
+    "Airline": "category",  # Categórica → codificada pelo próprio dicionário
+    "Distance": "float32",  # Numérica
+    "ArrDelay": "float32",  # Numérica
+    "Month": "uint8",
+}
+
+
+def preparar(df):
+    '''Filtra voos não cancelados, remove valores ausentes e aplica os tipos compactos'''
+    df = df[df["Cancelled"] == False]
+    df = df[list(tipos)].dropna()
+    return df.astype(tipos).reset_index(drop=True)
+
+
+def carregar_preparado(path=PATH_PREPARADO):
+    '''Carrega o dataset preparado via memory map. As colunas numéricas ficam
+    apontando para o arquivo mapeado (sem cópia) e Airline já vem categórica.'''
+    tabela = feather.read_table(path, memory_map=True)
+    return tabela.to_pandas(split_blocks=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prepara o dataset do agrupamento e da classificação')
+    parser.add_argument('--anos', type=int, nargs='+', help='só voos destes anos')
+    parser.add_argument('--meses', type=int, nargs='+', help='só voos destes meses')
+    parser.add_argument('--companhias', nargs='+', help='só voos destas companhias')
+    instrumentacao.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacao.configurar(args)
+
+    # --- Carregar dados do Parquet particionado, só as partições pedidas ---
+    with etapa('carregar', bytes_lidos=tamanho("data/reduced")) as medida:
+        df = carregar_voos("data/reduced",
+                           columns=["Airline", "Distance", "ArrDelay", "Cancelled", "Month"],
+                           filtros=filtros_voos(args.anos, args.meses, args.companhias))
+        medida['linhas_saida'] = len(df)
+
+    with etapa('preparar', linhas_entrada=len(df)) as medida:
+        df = preparar(df)
+        medida['linhas_saida'] = len(df)
+
+    # --- Salvar dataset limpo para o agrupamento ---
+    with etapa('salvar', linhas_entrada=len(df)) as medida:
+        os.makedirs("data", exist_ok=True)
+        feather.write_feather(df, PATH_PREPARADO, compression='uncompressed')
+        medida['bytes_escritos'] = tamanho(PATH_PREPARADO)
+
+    print(f"✅ Dados preparados com sucesso e salvos em '{PATH_PREPARADO}'")
+    instrumentacao.relatorio(args.relatorio)
@@ -1,18 +1,168 @@
-import pandas as pd
+import argparse
+import itertools
+import os
 
-path = '../data/Combined_Flights_2019.parquet'
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-df_raw = pd.read_parquet(path)
+import instrumentacao
+from instrumentacao import etapa, tamanho
+from voos import carregar_codigos, compactar, salvar_codigos
+
+# Colunas que viram diretórios do dataset particionado (ver voos.PARTICIONAMENTO)
+PARTICOES = ['Year', 'Month']
 
 # Se necessário, selecione apenas as colunas desejadas
 colunas_necessarias = [
     "Airline", "Cancelled", "ArrDelay", "OriginCityName", "DestCityName",
-    "Distance", "Month", "DayofMonth", "DayOfWeek", "ArrTime"
+    "Distance", "Year", "Month", "DayofMonth", "DayOfWeek", "ArrTime"
 ]
-df_raw = df_raw[colunas_necessarias]
 
-# Ajustes para manter compatibilidade com o restante do código
-df_raw.rename(columns={'DayofMonth': 'DayOfMonth'}, inplace=True)
-df_raw.dropna(subset=["Airline", "OriginCityName", "DestCityName", "Distance"], inplace=True)
-df_raw.fillna(0, inplace=True)
-df_raw.to_parquet('../data/reduced_Combined_Flights_2019(1).parquet', compression='brotli')
+
+def reduzir(path, outdir, batch_size=256_000, row_group_size=64_000):
+    '''Reduz o parquet original em streaming: lê só as colunas necessárias, um
+    lote por vez, e vai escrevendo a saída incrementalmente. O pico de memória
+    depende de `batch_size`, não do tamanho do arquivo.
+
+    A saída já vai na representação compacta de `voos.compactar`, particionada em
+    `outdir/Year=<ano>/Month=<mês>/<arquivo de origem>.parquet` (Year e Month ficam
+    só no caminho), e a tabela de códigos de companhias/cidades é atualizada em
+    `data/codigos.json`.
+    Retorna os arquivos escritos.'''
+    arquivo = pq.ParquetFile(path)
+    nome = os.path.splitext(os.path.basename(path))[0] + '.parquet'
+    codigos = carregar_codigos()
+    schema = None
+    writers = {}
+    escritos = []
+    with etapa(f'reduzir:{nome}', linhas_entrada=arquivo.metadata.num_rows, bytes_lidos=tamanho(path)) as medida:
+        linhas = 0
+        try:
+            for batch in arquivo.iter_batches(batch_size=batch_size, columns=colunas_necessarias):
+                df = batch.to_pandas()
+
+                # Ajustes para manter compatibilidade com o restante do código
+                df.rename(columns={'DayofMonth': 'DayOfMonth'}, inplace=True)
+                df.dropna(subset=["Airline", "OriginCityName", "DestCityName", "Distance"], inplace=True)
+                df.fillna(0, inplace=True)
+                df = compactar(df, codigos)
+                linhas += len(df)
+
+                if schema is None:
+                    schema = _schema(df.drop(columns=PARTICOES))
+                for (ano, mes), parte in df.groupby(PARTICOES, sort=False):
+                    if (ano, mes) not in writers:
+                        pasta = os.path.join(outdir, f'Year={ano}', f'Month={mes}')
+                        os.makedirs(pasta, exist_ok=True)
+                        escritos.append(os.path.join(pasta, nome))
+                        writers[(ano, mes)] = pq.ParquetWriter(escritos[-1], schema, compression='brotli')
+                    writers[(ano, mes)].write_table(pa.Table.from_pandas(parte.drop(columns=PARTICOES),
+                                                                         schema=schema, preserve_index=False))
+        finally:
+            for writer in writers.values():
+                writer.close()
+        salvar_codigos(codigos)
+
+        with etapa('ordenar por companhia', linhas_entrada=linhas):
+            for particao in escritos:
+                _ordenar_por_companhia(particao, row_group_size, batch_size)
+        medida['linhas_saida'] = linhas
+        medida['bytes_escritos'] = tamanho(*escritos)
+    return escritos
+
+
+def _schema(df):
+    '''Schema fixo para todos os lotes. As categóricas (companhias e cidades) vão como
+    string simples: o parquet já as codifica por dicionário internamente, e o pyarrow
+    só poda row groups pelas estatísticas em colunas que não são do tipo dictionary.
+    `voos.compactar` as converte de volta em categóricas na leitura.'''
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, campo in enumerate(schema):
+        if pa.types.is_dictionary(campo.type):
+            schema = schema.set(i, campo.with_type(pa.string()))
+    return schema
+
+
+def _lotes(arquivo, batch_size, schema):
+    '''Lotes do arquivo como frames de cerca de `batch_size` linhas; junta os row
+    groups pequenos (um por lote de entrada e mês) para não gravar fatias minúsculas'''
+    pendentes, linhas = [], 0
+    for batch in arquivo.iter_batches(batch_size=batch_size):
+        pendentes.append(batch)
+        linhas += batch.num_rows
+        if linhas >= batch_size:
+            yield pa.Table.from_batches(pendentes, schema=schema).to_pandas()
+            pendentes, linhas = [], 0
+    if pendentes:
+        yield pa.Table.from_batches(pendentes, schema=schema).to_pandas()
+
+
+def _ordenar_por_companhia(path, row_group_size, batch_size):
+    '''Reescreve um arquivo de partição (um mês) ordenado por Airline, para que as
+    estatísticas de cada row group permitam pular as outras companhias na leitura.
+
+    Ordena em memória limitada por `batch_size`: um arquivo de até um lote é ordenado
+    direto; um maior tem os lotes distribuídos em um arquivo temporário por companhia,
+    que depois são concatenados em ordem.'''
+    arquivo = pq.ParquetFile(path)
+    schema = arquivo.schema_arrow
+    lotes = _lotes(arquivo, batch_size, schema)
+    primeiro = next(lotes, None)
+    segundo = next(lotes, None)
+    if segundo is None:
+        if primeiro is not None:
+            df = primeiro.iloc[primeiro['Airline'].astype(str).argsort(kind='stable')]
+            pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path,
+                           row_group_size=row_group_size, compression='brotli')
+        return
+
+    temporarios = {}
+    writers = {}
+    try:
+        for df in itertools.chain([primeiro, segundo], lotes):
+            for comp, parte in df.groupby(df['Airline'].astype(str), sort=False):
+                if comp not in writers:
+                    temporarios[comp] = f'{path}.{len(temporarios)}.tmp'
+                    writers[comp] = pq.ParquetWriter(temporarios[comp], schema, compression='none')
+                writers[comp].write_table(pa.Table.from_pandas(parte, schema=schema, preserve_index=False))
+        for writer in writers.values():
+            writer.close()
+
+        # os lotes de cada companhia são juntados em row groups de até row_group_size linhas
+        with pq.ParquetWriter(path + '.tmp', schema, compression='brotli') as saida:
+            for comp in sorted(temporarios):
+                pendentes, linhas = [], 0
+                for lote in pq.ParquetFile(temporarios[comp]).iter_batches(batch_size=row_group_size):
+                    if linhas + lote.num_rows > row_group_size:
+                        saida.write_table(pa.Table.from_batches(pendentes, schema=schema))
+                        pendentes, linhas = [], 0
+                    pendentes.append(lote)
+                    linhas += lote.num_rows
+                if pendentes:
+                    saida.write_table(pa.Table.from_batches(pendentes, schema=schema))
+        os.replace(path + '.tmp', path)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        for temporario in temporarios.values():
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reduz os parquets do Kaggle às colunas usadas, '
+                                                 'particionando por ano e mês')
+    parser.add_argument('paths', nargs='*', default=['../data/Combined_Flights_2019.parquet'],
+                        help='arquivos originais (ex.: Combined_Flights_2018.parquet ... 2022)')
+    parser.add_argument('--saida', default='../data/reduced/',
+                        help='diretório do dataset particionado')
+    parser.add_argument('--batch-size', type=int, default=256_000,
+                        help='linhas por lote lido do arquivo original')
+    instrumentacao.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    instrumentacao.configurar(args)
+
+    for path in args.paths:
+        reduzir(path, args.saida, args.batch_size)
+
+    instrumentacao.relatorio(args.relatorio)
@@ -0,0 +1,398 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+import agregacao
+import amostragem
+import instrumentacao
+from instrumentacao import etapa, tamanho
+from pacote import ARQUIVO_PACOTE, escrever_pacote
+from voos import carregar_voos, lotes_voos, particao_voos, relatorio_memoria
+
+PASTA_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+ARQUIVO_MANIFESTO = 'manifesto.json'
+# Muda quando o formato do manifesto muda; um manifesto de outra versão é descartado
+VERSAO_MANIFESTO = 2
+# Parciais em cache que não servem ao build atual são apagados depois de tantos dias sem uso
+DIAS_CACHE = 30
+
+
+TAMANHO_PREVIA = 100
+
+
+def amostrar(lotes):
+    '''Amostra uniforme de TAMANHO_PREVIA voos para a "Visão Geral", lida em lotes'''
+    return amostragem.amostrar_lotes(lotes, TAMANHO_PREVIA)
+
+
+def combinar_amostras(partes):
+    return amostragem.combinar_amostras(partes, TAMANHO_PREVIA)
+
+
+# Intermediários: calculados por arquivo de dados, guardados no cache e combinados.
+# Como são estado mergeável (contagens, somas, amostra por prioridade), um arquivo
+# novo (ex.: um mês a mais) só exige processar as linhas dele.
+# nome: (colunas lidas do parquet, função que recebe o frame de voos, função que combina as partes)
+INTERMEDIARIOS = {
+    'agregado': (['Airline', 'DestCityName', 'Distance', 'ArrDelay', 'Cancelled'],
+                 agregacao.agregar, agregacao.combinar_agregados),
+    'cubo': (['Year', 'Month', 'DayOfMonth', 'DayOfWeek', 'ArrTime', 'Airline', 'ArrDelay', 'Cancelled'],
+             agregacao.cubo_temporal, agregacao.combinar_cubos),
+    'histograma': (['Airline', 'DestCityName', 'Distance', 'ArrDelay'],
+                   agregacao.histograma_atrasos, agregacao.combinar_histogramas),
+    'rotas': (['Airline', 'OriginCityName', 'DestCityName', 'ArrDelay'],
+              agregacao.rotas, agregacao.combinar_rotas),
+    'amostra': (None, amostrar, combinar_amostras),
+}
+# Intermediários que recebem os voos lote a lote em vez do frame inteiro
+POR_LOTES = {'amostra'}
+# Funções que leem os dados; o código delas entra na chave de todos os intermediários
+LEITURA = [carregar_voos, lotes_voos]
+
+# Saída de `tables/`: o intermediário de que depende, a função que a escreve
+# (intermediário, outpath, **params) e os parâmetros, que também entram na chave.
+# Se a saída for vários arquivos, `escrever` retorna a lista deles (relativos a outpath).
+Saida = namedtuple('Saida', ['intermediario', 'escrever', 'params'])
+
+
+def escrever_csv(arquivo, tabela):
+    def escrever(agg, outpath):
+        tabela(agg).to_csv(outpath + arquivo, index=False)
+    return escrever
+
+
+def escrever_amostra(amostra, outpath):
+    amostra.drop(columns='ChaveAmostra').to_csv(outpath + '100samples.csv')
+
+
+def escrever_cubo(cubo, outpath):
+    cubo.to_parquet(outpath + 'cubo_temporal.parquet', index=False)
+
+
+# Saída do ranking de destinos em cada formato (ver agregacao.escrever_destinos)
+SAIDAS_DESTINOS = {'csv': 'comps', 'parquet': 'destinos_por_comp.parquet'}
+
+
+def declarar_saidas(formato_destinos='csv'):
+    '''Todas as saídas de `tables/`, indexadas pelo caminho relativo a outpath'''
+    saidas = {arquivo: Saida('agregado', escrever_csv(arquivo, tabela), {})
+              for arquivo, tabela in agregacao.TABELAS.items()}
+    saidas.update({arquivo: Saida('histograma', escrever_csv(arquivo, tabela), {})
+                   for arquivo, tabela in agregacao.TABELAS_QUANTIS.items()})
+    saidas.update({arquivo: Saida('rotas', escrever_csv(arquivo, tabela), {})
+                   for arquivo, tabela in agregacao.TABELAS_ROTAS.items()})
+    saidas['100samples.csv'] = Saida('amostra', escrever_amostra, {})
+    saidas['cubo_temporal.parquet'] = Saida('cubo', escrever_cubo, {})
+    saidas[SAIDAS_DESTINOS[formato_destinos]] = Saida('agregado', agregacao.escrever_destinos, {'formato': formato_destinos})
+    return saidas
+
+
+# --- Hashes ---
+
+def _hash(*partes):
+    return hashlib.sha256('\0'.join(map(str, partes)).encode()).hexdigest()
+
+
+def _nomes(codigo):
+    '''Nomes globais usados por um code object, incluindo lambdas e comprehensions'''
+    nomes = set(codigo.co_names)
+    for const in codigo.co_consts:
+        if inspect.iscode(const):
+            nomes |= _nomes(const)
+    return nomes
+
+
+def _do_projeto(objeto):
+    '''Se a função ou o módulo está nos scripts do projeto'''
+    arquivo = getattr(inspect.getmodule(objeto), '__file__', None)
+    return arquivo is not None and os.path.dirname(os.path.abspath(arquivo)) == PASTA_SCRIPTS
+
+
+def hash_codigo(funcao):
+    '''Hash do código-fonte da função e de tudo que ela usa dos scripts do projeto:
+    outras funções (recursivamente, inclusive via `modulo.funcao`), constantes como
+    `bins`/`labels` e os valores padrão dos argumentos.'''
+    h = hashlib.sha256()
+    vistos = set()
+    pilha = [funcao]
+    while pilha:
+        f = pilha.pop()
+        if f in vistos:
+            continue
+        vistos.add(f)
+        h.update(inspect.getsource(f).encode())
+
+        nomes = sorted(_nomes(f.__code__))
+        refs = [f.__globals__[nome] for nome in nomes if nome in f.__globals__]
+        # `modulo.nome`: os atributos citados de módulos do projeto (os nomes de atributo
+        # também estão em co_names)
+        refs += [getattr(ref, nome) for ref in list(refs) if inspect.ismodule(ref) and _do_projeto(ref)
+                 for nome in nomes if hasattr(ref, nome)]
+        refs += [celula.cell_contents for celula in f.__closure__ or ()]
+        # padrões como `semente=SEMENTE` são avaliados na definição, fora do código-fonte
+        refs += [*(f.__defaults__ or ()), *(f.__kwdefaults__ or {}).values()]
+        for ref in refs:
+            if inspect.isfunction(ref):
+                if _do_projeto(ref):
+                    pilha.append(ref)
+            elif isinstance(ref, (list, tuple, dict, str, int, float)):
+                try:
+                    h.update(json.dumps(ref).encode())
+                except TypeError:
+                    pass
+    return h.hexdigest()
+
+
+def hash_arquivo(path, anterior=None):
+    '''sha256 do conteúdo do arquivo. Se tamanho e mtime batem com o registro
+    `anterior` do manifesto, o hash registrado é reaproveitado.'''
+    stat = os.stat(path)
+    registro = {'path': os.path.abspath(path), 'tamanho': stat.st_size, 'mtime': stat.st_mtime}
+    if anterior and all(anterior.get(k) == v for k, v in registro.items()):
+        return anterior
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return {**registro, 'sha256': h.hexdigest()}
+
+
+# --- Manifesto ---
+
+def carregar_manifesto(outpath):
+    '''Manifesto do último build; um manifesto de outra versão (ou ilegível) vale
+    como nenhum, e todas as saídas são reconstruídas.'''
+    path = outpath + ARQUIVO_MANIFESTO
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                manifesto = json.load(f)
+        except ValueError:
+            manifesto = None
+        if isinstance(manifesto, dict) and manifesto.get('versao') == VERSAO_MANIFESTO:
+            return manifesto
+        print(f"⚠️ {path} é de outra versão; reconstruindo todas as tabelas")
+    return {'versao': VERSAO_MANIFESTO, 'dados': [], 'saidas': {}, 'arquivos': {}}
+
+
+def salvar_manifesto(manifesto, outpath):
+    with open(outpath + ARQUIVO_MANIFESTO, 'w', encoding='utf-8') as f:
+        json.dump({**manifesto, 'versao': VERSAO_MANIFESTO}, f, ensure_ascii=False, indent=1)
+
+
+# --- Build ---
+
+def _calcular_parciais(path, a_calcular, paths, filtros):
+    '''Lê um arquivo de dados e grava no cache os intermediários pedidos. Roda num
+    processo separado; retorna o relatório de memória do frame lido e os registros de
+    etapas desta tarefa (o processo do pool é reaproveitado entre tarefas).'''
+    inicio = len(instrumentacao.registros())
+    relatorio = f"{path}:"
+    particao = '/'.join(os.path.normpath(path).split(os.sep)[-3:])
+    with etapa(f'parcial:{particao}', bytes_lidos=tamanho(path)):
+        por_frame = [nome for nome in a_calcular if nome not in POR_LOTES]
+        if por_frame:
+            colunas = sorted(set().union(*[INTERMEDIARIOS[nome][0] for nome in por_frame]))
+            with etapa('ler') as medida:
+                df = carregar_voos(path, columns=colunas, filtros=filtros)
+                medida['linhas_saida'] = len(df)
+            for nome in por_frame:
+                with etapa(f'calcular:{nome}', linhas_entrada=len(df)) as medida:
+                    parcial = INTERMEDIARIOS[nome][1](df)
+                    parcial.to_parquet(paths[nome])
+                    medida['linhas_saida'] = len(parcial)
+            relatorio += f"\n{relatorio_memoria(df)}"
+            del df
+        for nome in a_calcular:
+            if nome in POR_LOTES:
+                with etapa(f'calcular:{nome}') as medida:
+                    lotes = lotes_voos(path, columns=INTERMEDIARIOS[nome][0], filtros=filtros)
+                    parcial = INTERMEDIARIOS[nome][1](lotes)
+                    parcial.to_parquet(paths[nome])
+                    medida['linhas_saida'] = len(parcial)
+    return relatorio, instrumentacao.registros()[inicio:]
+
+
+def _hash_leitura():
+    return _hash(*[hash_codigo(funcao) for funcao in LEITURA])
+
+
+def _identidade(registro):
+    '''O que define os voos de um arquivo: o conteúdo e a partição em que ele está'''
+    return f"{registro['sha256']}:{registro['particao']}"
+
+
+def _paths_parciais(registro, nomes, cachepath, filtros, leitura):
+    '''Caminho no cache do parcial de cada intermediário para um arquivo de dados'''
+    chaves = {nome: _hash(_identidade(registro), INTERMEDIARIOS[nome][0], filtros, leitura,
+                          hash_codigo(INTERMEDIARIOS[nome][1]))
+              for nome in nomes}
+    return {nome: cachepath + f'{nome}-{chaves[nome][:16]}.parquet' for nome in nomes}
+
+
+def limpar_cache(registros, cachepath, filtros, dias=DIAS_CACHE):
+    '''Apaga os parciais que não servem aos dados, filtros e código atuais e não são
+    usados há mais de `dias` dias (ex.: de um mês removido, de um código antigo ou de
+    filtros que não se usam mais). Retorna o número de arquivos apagados.'''
+    leitura = _hash_leitura()
+    atuais = set()
+    for registro in registros:
+        atuais.update(os.path.abspath(path) for path in
+                      _paths_parciais(registro, INTERMEDIARIOS, cachepath, filtros, leitura).values())
+    padrao = re.compile(rf"({'|'.join(INTERMEDIARIOS)})-[0-9a-f]{{16}}\.parquet")
+    limite = time.time() - dias * 86400
+    apagados = 0
+    for arquivo in os.listdir(cachepath):
+        path = os.path.join(cachepath, arquivo)
+        if (padrao.fullmatch(arquivo) and os.path.abspath(path) not in atuais
+                and os.path.getmtime(path) < limite):
+            os.remove(path)
+            apagados += 1
+    return apagados
+
+
+def _parciais(registros, necessarios, cachepath, filtros, forcar, processos):
+    '''Intermediários parciais de cada arquivo de dados: do cache quando o arquivo, os
+    filtros e o código não mudaram, senão calculados lendo só aquele arquivo.
+
+    Cada arquivo (uma partição ano/mês do dataset reduzido) é processado num processo
+    do pool, então o cálculo escala com o número de núcleos; como os parciais são
+    mergeáveis, a ordem em que terminam não importa.'''
+    paths = []
+    tarefas = []
+    leitura = _hash_leitura()
+    for registro in registros:
+        paths_arquivo = _paths_parciais(registro, necessarios, cachepath, filtros, leitura)
+        paths.append(paths_arquivo)
+
+        a_calcular = [nome for nome in necessarios if forcar or not os.path.exists(paths_arquivo[nome])]
+        # o mtime marca o último uso, que é o que limpar_cache considera
+        for nome in set(necessarios) - set(a_calcular):
+            os.utime(paths_arquivo[nome])
+        if a_calcular:
+            tarefas.append((registro['path'], a_calcular, paths_arquivo, filtros))
+
+    if len(tarefas) == 1 or processos == 1:
+        for tarefa in tarefas:
+            print(_calcular_parciais(*tarefa)[0])
+    elif tarefas:
+        with ProcessPoolExecutor(min(processos or os.cpu_count(), len(tarefas)),
+                                 initializer=instrumentacao.configurar_processo,
+                                 initargs=(instrumentacao.configuracao(),)) as pool:
+            for relatorio, medidas in pool.map(_calcular_parciais, *zip(*tarefas)):
+                print(relatorio)
+                instrumentacao.registrar(medidas)
+
+    return {nome: [pd.read_parquet(paths_arquivo[nome]) for paths_arquivo in paths]
+            for nome in necessarios}
+
+
+def _remover_saida(nome, manifesto, outpath):
+    '''Apaga os arquivos de uma saída que este build não gera mais (ex.: o ranking de
+    destinos no outro formato, que o app leria desatualizado) e a tira do manifesto.
+    Retorna se havia algo a apagar.'''
+    arquivos = manifesto['arquivos'].pop(nome, None)
+    manifesto['saidas'].pop(nome, None)
+    if arquivos is None:  # saída de antes do manifesto registrar os arquivos
+        arquivos = ([os.path.relpath(path, outpath) for path in glob.glob(outpath + 'comps/*_destinos.csv')]
+                    if nome == 'comps' else [nome])
+    apagados = [arquivo for arquivo in arquivos if os.path.exists(outpath + arquivo)]
+    for arquivo in apagados:
+        os.remove(outpath + arquivo)
+    return bool(apagados)
+
+
+def _escrever(nome, saida, intermediario, outpath):
+    # cada saída é uma etapa, ex.: `--perfil escrever:comps` para o laço por companhia
+    with etapa(f'escrever:{nome}', linhas_entrada=len(intermediario)) as medida:
+        arquivos = saida.escrever(intermediario, outpath, **saida.params) or [nome]
+        medida['bytes_escritos'] = tamanho(*[outpath + arquivo for arquivo in arquivos])
+    return arquivos
+
+
+def construir(datafiles, outpath, cachepath, formato_destinos='csv', filtros=None, forcar=False,
+              processos=None, threads=None, dias_cache=DIAS_CACHE):
+    '''Reconstrói só as saídas cujo dado de origem ou definição mudou desde o último
+    build registrado no manifesto.
+
+    `datafiles` pode ter vários arquivos (ex.: um por mês); os intermediários de cada
+    um ficam em `cachepath` e são combinados, então acrescentar um mês só processa o
+    arquivo novo, e mudar a definição de uma tabela não relê dado nenhum. `filtros`
+    (ver `voos.filtros_voos`) é aplicado na leitura de cada arquivo. Os arquivos a
+    processar são distribuídos em `processos` processos (padrão: um por núcleo).
+    Parciais do cache sem uso há `dias_cache` dias que não servem a este build são apagados.
+
+    Retorna a lista de saídas reconstruídas.'''
+    manifesto = carregar_manifesto(outpath)
+    anteriores = {registro['path']: registro for registro in manifesto['dados']}
+    with etapa('hash dos dados', bytes_lidos=tamanho(*datafiles)):
+        registros = [{**hash_arquivo(path, anteriores.get(os.path.abspath(path))), 'particao': particao_voos(path)}
+                     for path in datafiles]
+    # o mesmo arquivo listado duas vezes não pode ser somado duas vezes; o mesmo conteúdo
+    # em outra partição (Year/Month só estão no caminho) são outros voos
+    registros = list({_identidade(registro): registro for registro in registros}.values())
+    manifesto['dados'] = registros
+    hash_dados = _hash(*sorted(map(_identidade, registros)))
+
+    leitura = _hash_leitura()
+    chaves_inter = {nome: _hash(hash_dados, colunas, filtros, leitura, hash_codigo(calcular), hash_codigo(combinar))
+                    for nome, (colunas, calcular, combinar) in INTERMEDIARIOS.items()}
+
+    saidas = declarar_saidas(formato_destinos)
+    chaves_saida = {
+        nome: _hash(chaves_inter[saida.intermediario], hash_codigo(saida.escrever),
+                    json.dumps(saida.params, sort_keys=True))
+        for nome, saida in saidas.items()
+    }
+    # uma saída de vários arquivos (ex.: comps/) só está completa se todos existem
+    arquivos = manifesto.setdefault('arquivos', {})
+    obsoletas = [nome for nome in SAIDAS_DESTINOS.values() if nome not in saidas]
+    removidas = [nome for nome in obsoletas if _remover_saida(nome, manifesto, outpath)]
+    if removidas:
+        print(f"🗑️ Ranking de destinos no outro formato apagado: {', '.join(removidas)}")
+    pendentes = [nome for nome in saidas
+                 if forcar
+                 or manifesto['saidas'].get(nome) != chaves_saida[nome]
+                 or nome not in arquivos
+                 or not all(os.path.exists(outpath + arquivo) for arquivo in arquivos[nome])]
+    if not pendentes and not removidas and os.path.exists(outpath + ARQUIVO_PACOTE):
+        return []
+
+    # --- Intermediários: parciais por arquivo, combinados ---
+    necessarios = sorted({saidas[nome].intermediario for nome in pendentes})
+    os.makedirs(cachepath, exist_ok=True)
+    with etapa('parciais'):
+        parciais = _parciais(registros, necessarios, cachepath, filtros, forcar, processos)
+    apagados = limpar_cache(registros, cachepath, filtros, dias_cache)
+    if apagados:
+        print(f"🧹 {apagados} parciais antigos apagados de {cachepath}")
+    resultados = {}
+    for nome, partes in parciais.items():
+        with etapa(f'combinar:{nome}', linhas_entrada=sum(map(len, partes))) as medida:
+            resultados[nome] = INTERMEDIARIOS[nome][2](partes)
+            medida['linhas_saida'] = len(resultados[nome])
+
+    # --- Saídas independentes em paralelo ---
+    os.makedirs(outpath + 'comps', exist_ok=True)
+    with etapa('escrever saidas'), ThreadPoolExecutor(threads) as pool:
+        futuros = {nome: pool.submit(_escrever, nome, saidas[nome], resultados[saidas[nome].intermediario],
+                                     outpath)
+                   for nome in pendentes}
+    for nome, futuro in futuros.items():
+        arquivos[nome] = futuro.result()
+        manifesto['saidas'][nome] = chaves_saida[nome]
+
+    # pacote lido pelo app, com todas as tabelas já atualizadas
+    with etapa('pacote') as medida:
+        escrever_pacote(outpath)
+        medida['bytes_escritos'] = tamanho(outpath + ARQUIVO_PACOTE)
+    salvar_manifesto(manifesto, outpath)
+    return pendentes
@@ -0,0 +1,155 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Tabela de códigos persistida junto dos dados. Valores novos só são acrescentados
+# ao fim, então o código de uma companhia/cidade não muda entre arquivos e anos.
+PATH_CODIGOS = os.path.join(os.path.dirname(__file__), '..', 'data', 'codigos.json')
+
+# Colunas codificadas por dicionário → nome da tabela de códigos.
+# Origem e destino compartilham a tabela de cidades, então os códigos são comparáveis.
+TABELA_DA_COLUNA = {
+    'Airline': 'Airline',
+    'OriginCityName': 'City',
+    'DestCityName': 'City',
+}
+
+# Dataset reduzido particionado por ano e mês: data/reduced/Year=2019/Month=1/...
+# Year e Month só existem no caminho (um `pd.read_parquet('data/reduced')` comum
+# também funciona); a leitura por aqui os recupera do caminho mesmo de um arquivo só.
+PARTICIONAMENTO = ds.partitioning(pa.schema([('Year', pa.uint16()), ('Month', pa.uint8())]), flavor='hive')
+
+TIPOS = {
+    'Year': 'uint16',
+    'Cancelled': 'bool',
+    'ArrDelay': 'float32',
+    'Distance': 'float32',
+    'Month': 'uint8',
+    'DayOfMonth': 'uint8',
+    'DayOfWeek': 'uint8',
+    'ArrTime': 'uint16',  # hhmm, até 2400
+    'HourBlock': 'uint8',
+}
+
+
+def carregar_codigos(path=PATH_CODIGOS):
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def salvar_codigos(codigos, path=PATH_CODIGOS):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(codigos, f, ensure_ascii=False, indent=1)
+
+
+def compactar(df, codigos=None):
+    '''Converte o frame de voos para a representação compacta: companhias e cidades
+    viram categóricas com os códigos de `codigos` (acrescentando valores novos),
+    campos de calendário viram inteiros estreitos e HourBlock é derivado de ArrTime.'''
+    if codigos is None:
+        codigos = carregar_codigos()
+
+    for col, nome in TABELA_DA_COLUNA.items():
+        if col not in df:
+            continue
+        tabela = codigos.setdefault(nome, [])
+        novos = pd.Index(df[col].unique()).dropna().difference(tabela)
+        tabela.extend(sorted(novos))
+        df[col] = pd.Categorical(df[col], categories=tabela)
+
+    if 'ArrTime' in df and 'HourBlock' not in df:
+        df['HourBlock'] = df['ArrTime'] // 100
+
+    return df.astype({col: tipo for col, tipo in TIPOS.items() if col in df})
+
+
+def filtros_voos(anos=None, meses=None, companhias=None):
+    '''Filtros no formato do `pd.read_parquet`. Ano e mês podam diretórios inteiros
+    do dataset particionado; companhia poda row groups pelas estatísticas, já que os
+    arquivos são ordenados por Airline.'''
+    filtros = [(col, 'in', list(valores))
+               for col, valores in [('Year', anos), ('Month', meses), ('Airline', companhias)]
+               if valores]
+    return filtros or None
+
+
+def _expressao(filtros):
+    '''Converte a lista de filtros do pandas numa expressão do pyarrow.dataset'''
+    if not filtros:
+        return None
+    expressao = None
+    for col, _, valores in filtros:
+        termo = ds.field(col).isin(valores)
+        expressao = termo if expressao is None else expressao & termo
+    return expressao
+
+
+def particao_voos(path):
+    '''Partição de um arquivo do dataset (ex.: "Year=2019/Month=1"), que não está no
+    conteúdo dele; vazio para um arquivo fora do dataset particionado'''
+    pasta = os.path.dirname(os.path.abspath(path))
+    if not os.path.basename(pasta).startswith('Month='):
+        return ''
+    return f'{os.path.basename(os.path.dirname(pasta))}/{os.path.basename(pasta)}'
+
+
+def _dataset(path):
+    '''Dataset do pyarrow para o diretório particionado ou para um arquivo dele; num
+    arquivo dentro de Year=/Month=, as colunas de partição vêm do caminho'''
+    if os.path.isdir(path):
+        return ds.dataset(path, format='parquet', partitioning=PARTICIONAMENTO)
+    pasta = os.path.dirname(os.path.abspath(path))
+    if particao_voos(path):
+        return ds.dataset([path], format='parquet', partitioning=PARTICIONAMENTO,
+                          partition_base_dir=os.path.dirname(os.path.dirname(pasta)))
+    return ds.dataset(path, format='parquet')
+
+
+def arquivos_voos(path, anos=None, meses=None):
+    '''Arquivos do dataset particionado que podem ter voos dos anos/meses pedidos,
+    sem abrir os demais'''
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"dataset reduzido não encontrado em '{path}'; rode reduce_file.py")
+    if not os.path.isdir(path):
+        return [path]
+    dataset = _dataset(path)
+    filtro = _expressao(filtros_voos(anos, meses))
+    return sorted(fragmento.path for fragmento in dataset.get_fragments(filter=filtro))
+
+
+def carregar_voos(path, columns=None, codigos=None, filtros=None):
+    '''Lê o parquet reduzido (arquivo ou dataset particionado), só as colunas pedidas
+    e só os voos que passam em `filtros` (ver `filtros_voos`), já na representação compacta'''
+    df = _dataset(path).to_table(columns=columns, filter=_expressao(filtros)).to_pandas()
+    return compactar(df, codigos)
+
+
+def lotes_voos(path, columns=None, filtros=None, codigos=None, tamanho_lote=256_000):
+    '''Itera sobre os voos em lotes de até `tamanho_lote` linhas, já na representação
+    compacta, sem nunca ter o arquivo inteiro em memória. Se nenhum voo passa nos
+    filtros, produz um único lote vazio, com as colunas pedidas.'''
+    if codigos is None:
+        codigos = carregar_codigos()
+    dataset = _dataset(path)
+    vazio = True
+    for lote in dataset.to_batches(columns=columns, filter=_expressao(filtros), batch_size=tamanho_lote):
+        if lote.num_rows:
+            vazio = False
+            yield compactar(lote.to_pandas(), codigos)
+    if vazio:
+        tabela = dataset.schema.empty_table()
+        yield compactar((tabela.select(columns) if columns else tabela).to_pandas(), codigos)
+
+
+def relatorio_memoria(df):
+    '''Memória ocupada por coluna e total, em MB'''
+    uso = df.memory_usage(deep=True, index=False) / 2**20
+    linhas = [f'{col:<16}{str(df[col].dtype):<10}{mb:10.2f} MB' for col, mb in uso.items()]
+    linhas.append(f'{"Total":<26}{uso.sum():10.2f} MB ({len(df):,} voos)')
+    return '\n'.join(linhas)